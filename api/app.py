@@ -2,18 +2,42 @@ from fastapi import FastAPI, HTTPException, status, BackgroundTasks, Body
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Union, Any, TypeVar
-from datetime import datetime
+from typing import List, Dict, Optional, Union, Any, TypeVar, Sequence, Callable, Tuple, Iterable, Iterator, Mapping
+from functools import lru_cache
+from datetime import datetime, timedelta
 import firebase_admin
 import json
 from firebase_admin import credentials, firestore
 from google.cloud import firestore as gc_firestore
 from google.cloud.firestore import GeoPoint
 import aiofiles
+import asyncio
+import base64
+import hashlib
+import mmap
 import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from typing import Optional
 import requests
-from math import radians, sin, cos, sqrt, atan2, ceil
+import re
+import unicodedata
+from math import radians, sin, cos, sqrt, asin, ceil, floor, pi, isnan, isfinite, nan, exp, log
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+from itertools import islice
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
 
 
 def load_env_file():
@@ -35,6 +59,19 @@ firebase_admin.initialize_app(cred)
 # Get Firestore client
 db = firestore.client()
 
+# The Firestore client is synchronous. Handlers run its calls on this
+# bounded pool so a slow round-trip never blocks the event loop.
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "32"))
+_firestore_executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+async def run_firestore(fn, *args, **kwargs):
+    """
+    Run a blocking Firestore call, e.g. `await run_firestore(doc_ref.get)`,
+    on the Firestore thread pool and return its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_firestore_executor, partial(fn, *args, **kwargs))
+
 app = FastAPI()
 
 # Add CORS middleware
@@ -188,6 +225,16 @@ class RestaurantReviews(BaseModel):
     yelp_business_id: Optional[str] = None
     fetch_time: str
     reviews: List[Review]
+    next_cursor: Optional[str] = None
+
+class PlatformReviewSummary(BaseModel):
+    count: int
+    rated_count: int
+    mean: Optional[float] = None
+    histogram: Dict[str, int]
+
+class ReviewSummary(PlatformReviewSummary):
+    platforms: Dict[str, PlatformReviewSummary]
 
 #List model
 class RestaurantListBase(BaseModel):
@@ -204,18 +251,24 @@ class RestaurantListRead(RestaurantListBase):
     num_likes: int = 0
     favorited_by: List[str] = []
 
+class RestaurantListDetail(RestaurantListRead):
+    full_restaurants: Optional[List[Dict[str, Any]]] = None  # None when not expanded
+    missing: List[str] = []  # place_ids with no restaurant data
+
 # --- Original User Endpoints ---
 @app.post("/users", status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate):
     try:
-        uid_query = db.collection("users").where("uid", "==", user.uid).get()
+        uid_query, user_doc = await asyncio.gather(
+            run_firestore(db.collection("users").where("uid", "==", user.uid).get),
+            run_firestore(db.collection("users").document(user.username).get),
+        )
         if len(list(uid_query)) > 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this authentication already exists"
             )
 
-        user_doc = db.collection("users").document(user.username).get()
         if user_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -236,7 +289,7 @@ async def create_user(user: UserCreate):
             "numOfLists": 0,
         }
 
-        db.collection("users").document(user.username).set(user_data)
+        await run_firestore(db.collection("users").document(user.username).set, user_data)
 
         # Grant "first_account_creation" achievement
         new_achievements = await check_and_award_achievements(user.username, "first_account_creation")
@@ -260,7 +313,7 @@ async def create_user(user: UserCreate):
 @app.get("/users/{username}", response_model=UserRead)
 async def get_user(username: str):
     try:
-        user_doc = db.collection("users").document(username).get()
+        user_doc = await run_firestore(db.collection("users").document(username).get)
         
         if not user_doc.exists:
             raise HTTPException(
@@ -291,10 +344,10 @@ async def update_user_points(
         # Get user reference
         users_ref = db.collection('users')
         user_query = users_ref.filter('username', '==', username).limit(1)
-        user_docs = user_query.stream()
+        user_docs = await run_firestore(user_query.get)
         
         # Get the user document
-        user_doc = next(user_docs, None)
+        user_doc = next(iter(user_docs), None)
         if not user_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -314,7 +367,7 @@ async def update_user_points(
         new_general_points = current_points.get('generalPoints', 0) + points_update.points
         
         # Update only the generalPoints
-        user_doc.reference.update({
+        await run_firestore(user_doc.reference.update, {
             'points.generalPoints': new_general_points
         })
         
@@ -352,10 +405,10 @@ async def update_user(user_id: str, user_update: UserUpdateRequest):
         update_data["updatedAt"] = firestore.SERVER_TIMESTAMP
         
         # Update the document
-        user_ref.update(update_data)
+        await run_firestore(user_ref.update, update_data)
         
         # Get and return the updated document
-        updated_doc = user_ref.get()
+        updated_doc = await run_firestore(user_ref.get)
         return updated_doc.to_dict()
 
     except Exception as e:
@@ -367,7 +420,7 @@ async def update_user(user_id: str, user_update: UserUpdateRequest):
 @app.get("/users/auth/{uid}", response_model=UserRead)
 async def get_user_by_uid(uid: str):
     try:
-        users = db.collection("users").where("uid", "==", uid).limit(1).get()
+        users = await run_firestore(db.collection("users").where("uid", "==", uid).limit(1).get)
         user_list = list(users)
         
         if not user_list:
@@ -394,7 +447,7 @@ async def get_user_by_uid(uid: str):
 async def update_user_by_uid(uid: str, user_update: UserUpdateRequest):
     try:
         # Fetch the user data from Firestore
-        users = db.collection("users").where("uid", "==", uid).limit(1).get()
+        users = await run_firestore(db.collection("users").where("uid", "==", uid).limit(1).get)
         user_list = list(users)
         
         if not user_list:
@@ -425,10 +478,10 @@ async def update_user_by_uid(uid: str, user_update: UserUpdateRequest):
             )
             
         # Update the user document
-        user_ref.update(update_data)
+        await run_firestore(user_ref.update, update_data)
         
         # Fetch and return the updated user data
-        updated_user = user_ref.get()
+        updated_user = await run_firestore(user_ref.get)
         user_data = updated_user.to_dict()
         return user_data
         
@@ -445,7 +498,7 @@ async def update_user_by_uid(uid: str, user_update: UserUpdateRequest):
 @app.get("/users")
 async def get_all_users():
     try:
-        users_ref = db.collection("users").stream()
+        users_ref = await run_firestore(db.collection("users").get)
         users = []
         for doc in users_ref:
             user_data = doc.to_dict()
@@ -458,37 +511,52 @@ async def get_all_users():
 # Get user's lists with restaurant details
 @app.get("/users/{username}/lists/details")
 async def get_user_lists_with_details(username: str):
+    """
+    All of a user's lists with their restaurants resolved once for all lists,
+    from the catalog with a batched Firestore read for the rest.
+    Each list's `detailed_restaurants` follows its `restaurants` order;
+    place_ids that could not be resolved are listed in `missing`.
+    """
     try:
         lists = await get_user_restaurant_lists(username)
-        detailed_lists = []
 
-        for list_item in lists:
-            restaurants = []
-            for place_id in list_item.get("restaurants", []):
-                try:
-                    restaurant = await get_restaurant(place_id)
-                    restaurants.append(restaurant)
-                except:
-                    continue
+        # Resolve every place in every list once
+        place_ids = list(dict.fromkeys(
+            place_id for list_item in lists for place_id in list_item.get("restaurants", [])
+        ))
+        restaurants, missing_ids = await hydrate_restaurants(place_ids)
+        missing_ids = set(missing_ids)
+        resolved = dict(zip([place_id for place_id in place_ids if place_id not in missing_ids], restaurants))
 
-            list_item["detailed_restaurants"] = restaurants
+        detailed_lists = []
+        for list_item in lists:
+            list_place_ids = list_item.get("restaurants", [])
+            list_item["detailed_restaurants"] = [
+                resolved[place_id] for place_id in list_place_ids if place_id in resolved
+            ]
+            list_item["missing"] = [place_id for place_id in list_place_ids if place_id not in resolved]
             detailed_lists.append(list_item)
 
         return detailed_lists
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.get("/users/{username}/lists", response_model=List[RestaurantListRead])
 async def get_user_lists(username: str):
     try:
-        user_doc = db.collection("users").document(username).get()
+        user_ref = db.collection("users").document(username)
+        user_doc, lists = await asyncio.gather(
+            run_firestore(user_ref.get),
+            run_firestore(user_ref.collection("lists").get),
+        )
         if not user_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User '{username}' not found"
             )
 
-        lists = db.collection("users").document(username).collection("lists").get()
         return [validate_and_serialize(doc.to_dict()) for doc in lists]
     except HTTPException as he:
         raise he
@@ -501,7 +569,7 @@ async def get_user_lists(username: str):
 @app.get("/users/{username}/lists/{list_id}", response_model=RestaurantListRead)
 async def get_playlist(username: str, list_id: str):
     try:
-        doc = db.collection("users").document(username).collection("lists").document(list_id).get()
+        doc = await run_firestore(db.collection("users").document(username).collection("lists").document(list_id).get)
         if not doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -523,8 +591,13 @@ async def update_playlist(username: str, list_id: str, playlist: RestaurantListB
         user_list_ref = db.collection("users").document(username).collection("lists").document(list_id)
         global_list_ref = db.collection("allLists").document(list_id)
         
+        # Read both copies of the list at once
+        user_list_doc, global_list_doc = await asyncio.gather(
+            run_firestore(user_list_ref.get),
+            run_firestore(global_list_ref.get),
+        )
+
         # Verify the user list exists
-        user_list_doc = user_list_ref.get()
         if not user_list_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -532,7 +605,6 @@ async def update_playlist(username: str, list_id: str, playlist: RestaurantListB
             )
             
         # Verify the global list exists
-        global_list_doc = global_list_ref.get()
         if not global_list_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -560,7 +632,7 @@ async def update_playlist(username: str, list_id: str, playlist: RestaurantListB
         batch.update(global_list_ref, update_data)
         
         # Commit the batch
-        batch.commit()
+        await run_firestore(batch.commit)
         
         return {
             "message": "Playlist updated successfully in both collections",
@@ -590,7 +662,7 @@ async def add_place_to_restaurants(username: str, list_id: str, body: dict):
         global_list_ref = db.collection("allLists").document(list_id)
 
         # Verify list exists in user's collection
-        user_list_doc = user_list_ref.get()
+        user_list_doc = await run_firestore(user_list_ref.get)
         if not user_list_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -620,7 +692,7 @@ async def add_place_to_restaurants(username: str, list_id: str, body: dict):
         })
 
         # Commit the batch
-        batch.commit()
+        await run_firestore(batch.commit)
 
         return {
             "message": f"Place ID '{place_id}' successfully added to the list '{list_id}'."
@@ -635,333 +707,2365 @@ async def add_place_to_restaurants(username: str, list_id: str, body: dict):
         )
 
 
+# --- Cache snapshots ---
+# Cache files are written as versioned snapshots: the payload goes to a temp
+# file that is fsynced and renamed into place, and a manifest records each
+# version with its content hash. Readers go through the manifest, so they only
+# ever see complete snapshots, and older versions stay around for rollback.
+CACHE_SNAPSHOT_DIR = 'cache_snapshots'
+CACHE_SNAPSHOT_KEEP = int(os.getenv("CACHE_SNAPSHOT_KEEP", "5"))
 
-@app.post("/admin/refresh-restaurant-cache")
-async def refresh_restaurant_cache(background_tasks: BackgroundTasks):
+# mkstemp creates files as 0600; replaced files get the mode of the file they
+# replace, or the usual mode for new files. Read once, while still single-threaded.
+_FILE_UMASK = os.umask(0)
+os.umask(_FILE_UMASK)
 
-    async def update_cache():
+def write_file_atomic(path: str, data: bytes):
+    """
+    Replace `path` with `data` so that readers see either the old or the new
+    file, never a partial one, even if the process dies mid-write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_FILE_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # Persist the rename itself
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
         try:
-            restaurants_ref = db.collection("restaurants").stream()
-            restaurant_list = []
-
-            for doc in restaurants_ref:
-                data = doc.to_dict()
-
-                # Collecting data for one restaurant
-                restaurant_data = {
-                    "name": data.get("name", {}),
-                    "ratings": data.get("ratings", {}),
-                    "location": data.get("location", {}),
-                    "price_level": data.get("price_level", {}),
-                    "types": data.get("types", {}),
-                    "additional_info": data.get("additional_info", {}),
-                    "match_confidence": data.get("match_confidence", None),
-                }
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
 
-                # Append the restaurant data
-                restaurant_list.append(restaurant_data)
+def _snapshot_name(cache_file: str) -> str:
+    return os.path.splitext(os.path.basename(cache_file))[0]
 
-            # Write the data to the cache file
-            async with aiofiles.open('restaurant_cache.json', 'w') as f:
-                await f.write(json.dumps(restaurant_list))
+def _snapshot_manifest_path(cache_file: str) -> str:
+    return os.path.join(CACHE_SNAPSHOT_DIR, f"{_snapshot_name(cache_file)}.manifest.json")
 
-            print("Cache updated successfully.")
+def _snapshot_path(cache_file: str, version: int) -> str:
+    return os.path.join(CACHE_SNAPSHOT_DIR, f"{_snapshot_name(cache_file)}.v{version}.json")
 
-        except Exception as e:
-            print(f"Error updating cache: {str(e)}")
+def read_snapshot_manifest(cache_file: str) -> dict:
+    path = _snapshot_manifest_path(cache_file)
+    if not os.path.exists(path):
+        return {"current": None, "versions": []}
+    with open(path, 'rb') as f:
+        return json.loads(f.read())
 
-    # Run the update process in the background
-    background_tasks.add_task(update_cache)
-    return {"message": "Cache refresh started"}
+_snapshot_locks: Dict[str, threading.Lock] = {}
+_snapshot_locks_guard = threading.Lock()
 
-@app.get("/restaurants", response_model=List[dict])
-async def get_restaurants(
-    search: Optional[str] = None,
-    cuisine: Optional[str] = None,
-    price_level: Optional[int] = None,
-):
+@contextmanager
+def snapshot_lock(cache_file: str):
     """
-    Retrieve all restaurants from the cache and apply optional filters:
-    - `search`: Search by name (gmaps or yelp).
-    - `cuisine`: Filter by types (gmaps or yelp).
-    - `price_level`: Filter by price levels (composite).
+    Serialize manifest updates of one cache file: a thread lock within this
+    process, plus an advisory file lock across workers where fcntl exists.
     """
-    try:
-        # Ensure the cache file exists
-        if not os.path.exists('restaurant_cache.json'):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Cache file not found. Please refresh the cache."
-            )
+    with _snapshot_locks_guard:
+        lock = _snapshot_locks.setdefault(cache_file, threading.Lock())
+    with lock:
+        os.makedirs(CACHE_SNAPSHOT_DIR, exist_ok=True)
+        lock_path = os.path.join(CACHE_SNAPSHOT_DIR, f"{_snapshot_name(cache_file)}.lock")
+        with open(lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+def write_cache_snapshot(cache_file: str, payload: Any) -> dict:
+    """
+    Write `payload` as a new snapshot version of `cache_file` and make it current.
+    The plain cache file is replaced atomically as well. Returns the version entry.
+    """
+    data = json.dumps(payload).encode()
+    with snapshot_lock(cache_file):
+        return _write_cache_snapshot_locked(cache_file, data)
+
+def _write_cache_snapshot_locked(cache_file: str, data: bytes) -> dict:
+    manifest = read_snapshot_manifest(cache_file)
+    version = max((v["version"] for v in manifest["versions"]), default=0) + 1
+    entry = {
+        "version": version,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+    write_file_atomic(_snapshot_path(cache_file, version), data)
+    write_file_atomic(cache_file, data)
+
+    # Keep the newest CACHE_SNAPSHOT_KEEP versions
+    versions = manifest["versions"] + [entry]
+    expired, versions = versions[:-CACHE_SNAPSHOT_KEEP], versions[-CACHE_SNAPSHOT_KEEP:]
+    write_file_atomic(
+        _snapshot_manifest_path(cache_file),
+        json.dumps({"current": version, "versions": versions}).encode(),
+    )
+    for old_entry in expired:
+        old_path = _snapshot_path(cache_file, old_entry["version"])
+        if os.path.exists(old_path):
+            os.remove(old_path)
+    return entry
+
+def read_cache_snapshot(cache_file: str) -> tuple:
+    """
+    Read the current snapshot of `cache_file`, verifying its content hash.
+    Returns (payload, version entry), or (None, None) if nothing was written yet.
+    Cache files that predate snapshots are read as they are, with no entry.
+    """
+    manifest = read_snapshot_manifest(cache_file)
+    if manifest["current"] is None:
+        if not os.path.exists(cache_file):
+            return None, None
+        with open(cache_file, 'rb') as f:
+            return json.loads(f.read()), None
+
+    entry = next(v for v in manifest["versions"] if v["version"] == manifest["current"])
+    with open(_snapshot_path(cache_file, entry["version"]), 'rb') as f:
+        data = f.read()
+    if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        raise ValueError(f"Snapshot {entry['version']} of {cache_file} failed its hash check")
+    return json.loads(data), entry
+
+def rollback_cache_snapshot(cache_file: str, version: int) -> tuple:
+    """
+    Make a retained snapshot version current again.
+    Returns (payload, version entry).
+    """
+    with snapshot_lock(cache_file):
+        return _rollback_cache_snapshot_locked(cache_file, version)
 
-        # Load the cache
-        async with aiofiles.open('restaurant_cache.json', 'r') as f:
-            content = await f.read()
-            restaurants = json.loads(content)  # List of restaurants
+def _rollback_cache_snapshot_locked(cache_file: str, version: int) -> tuple:
+    manifest = read_snapshot_manifest(cache_file)
+    entry = next((v for v in manifest["versions"] if v["version"] == version), None)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Snapshot version {version} of {cache_file} is not retained"
+        )
+    with open(_snapshot_path(cache_file, version), 'rb') as f:
+        data = f.read()
+    if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        raise ValueError(f"Snapshot {version} of {cache_file} failed its hash check")
+
+    write_file_atomic(cache_file, data)
+    write_file_atomic(
+        _snapshot_manifest_path(cache_file),
+        json.dumps({**manifest, "current": version}).encode(),
+    )
+    return json.loads(data), entry
+
+# --- Restaurant catalog ---
+RESTAURANT_CACHE_FILE = 'restaurant_cache.json'
+
+class CatalogColumns:
+    """
+    Column-oriented view of the restaurant fields the catalog indexes are
+    built from. Missing numbers are NaN and missing strings are "".
+    Built either from cached restaurant dicts or from a mapped catalog file.
+    """
+    FLOAT_COLUMNS = (
+        "lat", "lng",
+        "gmaps_rating", "gmaps_total", "yelp_rating", "yelp_total",
+        "price_min", "price_max",
+    )
+    STRING_COLUMNS = ("place_id", "yelp_id", "gmaps_name", "yelp_name")
+
+    def __init__(self, count: int, floats: Dict[str, Sequence[float]],
+                 strings: Dict[str, Sequence[str]], types: Sequence[List[str]]):
+        self.count = count
+        self.floats = floats
+        self.strings = strings
+        # Combined gmaps + yelp types per restaurant
+        self.types = types
+
+    @classmethod
+    def from_records(cls, restaurants: List[dict]) -> "CatalogColumns":
+        def number(value):
+            return nan if value is None else float(value)
+
+        floats = {name: array('d') for name in cls.FLOAT_COLUMNS}
+        strings = {name: [] for name in cls.STRING_COLUMNS}
+        types = []
+        for r in restaurants:
+            location = (r.get("location") or {}).get("gmaps") or {}
+            ratings = r.get("ratings") or {}
+            gmaps_ratings = ratings.get("gmaps") or {}
+            yelp_ratings = ratings.get("yelp") or {}
+            composite_price = (r.get("price_level") or {}).get("composite") or {}
+            floats["lat"].append(number(location.get("lat")))
+            floats["lng"].append(number(location.get("lng")))
+            floats["gmaps_rating"].append(number(gmaps_ratings.get("rating")))
+            floats["gmaps_total"].append(number(gmaps_ratings.get("total_ratings")))
+            floats["yelp_rating"].append(number(yelp_ratings.get("rating")))
+            floats["yelp_total"].append(number(yelp_ratings.get("total_ratings")))
+            floats["price_min"].append(number(composite_price.get("min")))
+            floats["price_max"].append(number(composite_price.get("max")))
+
+            additional_info = r.get("additional_info") or {}
+            name = r.get("name") or {}
+            strings["place_id"].append((additional_info.get("gmaps") or {}).get("place_id") or "")
+            strings["yelp_id"].append((additional_info.get("yelp") or {}).get("yelp_id") or "")
+            strings["gmaps_name"].append(name.get("gmaps") or "")
+            strings["yelp_name"].append(name.get("yelp") or "")
+
+            r_types = r.get("types") or {}
+            types.append((r_types.get("gmaps") or []) + (r_types.get("yelp") or []))
+        return cls(len(restaurants), floats, strings, types)
+
+# Read-only index structures stored flat (sorted keys plus arrays), so a
+# catalog built by one worker can be written to the catalog file and served
+# by every other worker straight from the mapping, without building dicts.
+# Array fields are memoryviews, over arrays when built or over the file.
+
+def sorted_contains(positions: Sequence[int], position: int) -> bool:
+    """Membership test on an ascending run of positions."""
+    i = bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+def _find_key(keys: Sequence, key) -> int:
+    i = bisect_left(keys, key)
+    return i if i < len(keys) and keys[i] == key else -1
+
+def _key_column(keys: List) -> Sequence:
+    # Int keys are stored as an int64 array, anything else as strings
+    if keys and isinstance(keys[0], int):
+        return memoryview(array('q', keys))
+    return keys
+
+class KeyIndex(Mapping):
+    """Unique key -> catalog position, as sorted keys and a parallel positions array."""
+    def __init__(self, keys: Sequence[str], positions: Sequence[int]):
+        self.sorted_keys = keys
+        self.positions = positions
+
+    @classmethod
+    def build(cls, positions: Dict[str, int]) -> "KeyIndex":
+        keys = sorted(positions)
+        return cls(keys, memoryview(array('i', [positions[key] for key in keys])))
+
+    def __getitem__(self, key) -> int:
+        i = _find_key(self.sorted_keys, key)
+        if i < 0:
+            raise KeyError(key)
+        return self.positions[i]
+
+    def __len__(self):
+        return len(self.sorted_keys)
+
+    def __iter__(self):
+        return iter(self.sorted_keys)
+
+    def to_sections(self, name: str) -> dict:
+        return {f"{name}.keys": self.sorted_keys, f"{name}.positions": self.positions}
+
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str) -> "KeyIndex":
+        return cls(mapped.section(f"{name}.keys"), mapped.section(f"{name}.positions"))
+
+class PostingsMap(Mapping):
+    """
+    Key -> run of positions: the sorted keys, the start of each key's run
+    (one extra entry for the end) and one array holding every run in key order.
+    """
+    def __init__(self, keys: Sequence, starts: Sequence[int], positions: Sequence[int]):
+        self.sorted_keys = keys
+        self.starts = starts
+        self.positions = positions
+
+    @classmethod
+    def build(cls, postings: Dict[Any, Iterable[int]]) -> "PostingsMap":
+        keys = sorted(postings)
+        starts = array('q', [0])
+        positions = array('i')
+        for key in keys:
+            positions.extend(postings[key])
+            starts.append(len(positions))
+        return cls(_key_column(keys), memoryview(starts), memoryview(positions))
+
+    def __getitem__(self, key) -> Sequence[int]:
+        i = _find_key(self.sorted_keys, key)
+        if i < 0:
+            raise KeyError(key)
+        return self.positions[self.starts[i]:self.starts[i + 1]]
+
+    def __len__(self):
+        return len(self.sorted_keys)
+
+    def __iter__(self):
+        return iter(self.sorted_keys)
+
+    def to_sections(self, name: str) -> dict:
+        return {
+            f"{name}.keys": self.sorted_keys,
+            f"{name}.starts": self.starts,
+            f"{name}.positions": self.positions,
+        }
 
-        # Filter by search
-        if search:
-            search_lower = search.lower()
-            restaurants = [
-                r for r in restaurants
-                if search_lower in r['name']['gmaps'].lower() or
-                   search_lower in r['name']['yelp'].lower()
-            ]
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str) -> "PostingsMap":
+        return cls(
+            mapped.section(f"{name}.keys"),
+            mapped.section(f"{name}.starts"),
+            mapped.section(f"{name}.positions"),
+        )
 
-        # Filter by cuisine
-        if cuisine:
-            cuisine_lower = cuisine.lower()
-            restaurants = [
-                r for r in restaurants
-                if cuisine_lower in r['types']['gmaps'] or cuisine_lower in r['types']['yelp']
-            ]
+class BitmapMap(Mapping):
+    """
+    Key -> bitmap, stored as sorted keys and one fixed-size little-endian
+    byte string per key. Each bitmap becomes an int on first use.
+    """
+    def __init__(self, keys: Sequence, data: Sequence[int], stride: int):
+        self.sorted_keys = keys
+        self.data = data
+        self.stride = stride
+        self.decoded: Dict[Any, int] = {}
+
+    @classmethod
+    def build(cls, bitmaps: Dict[Any, int], count: int) -> "BitmapMap":
+        keys = sorted(bitmaps)
+        stride = (count + 7) // 8
+        data = b"".join(bitmaps[key].to_bytes(stride, "little") for key in keys)
+        bitmap_map = cls(_key_column(keys), memoryview(data), stride)
+        bitmap_map.decoded = dict(bitmaps)
+        return bitmap_map
+
+    def __getitem__(self, key) -> int:
+        bitmap = self.decoded.get(key)
+        if bitmap is None:
+            i = _find_key(self.sorted_keys, key)
+            if i < 0:
+                raise KeyError(key)
+            bitmap = self.decoded[key] = int.from_bytes(self.data[i * self.stride:(i + 1) * self.stride], "little")
+        return bitmap
+
+    def __len__(self):
+        return len(self.sorted_keys)
+
+    def __iter__(self):
+        return iter(self.sorted_keys)
+
+    def to_sections(self, name: str) -> dict:
+        return {f"{name}.keys": self.sorted_keys, f"{name}.bitmaps": self.data}
+
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str, count: int) -> "BitmapMap":
+        return cls(mapped.section(f"{name}.keys"), mapped.section(f"{name}.bitmaps"), (count + 7) // 8)
+
+EARTH_RADIUS_KM = 6371  # Radius of Earth in kilometers
+KM_PER_DEGREE_LAT = EARTH_RADIUS_KM * pi / 180
+
+def haversine_distances(lat: float, lng: float, lats_rad, lngs_rad, cos_lats) -> List[float]:
+    """
+    Great-circle distances (km) from one point to many points.
+    The candidate coordinates are passed as parallel arrays already converted
+    to radians, with cos(lat) precomputed, so only the per-pair terms are evaluated.
+    """
+    lat1, lng1 = radians(lat), radians(lng)
+    cos_lat1 = cos(lat1)
+    return [
+        2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(
+            sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos_lat2 * sin((lng2 - lng1) / 2) ** 2
+        )))
+        for lat2, lng2, cos_lat2 in zip(lats_rad, lngs_rad, cos_lats)
+    ]
+
+class SpatialGrid:
+    """
+    Fixed-size lat/lng grid over catalog positions.
+    Radius and k-nearest queries only visit the cells that can contain a match,
+    then compute exact haversine distances for the candidates in those cells.
+    Rows (restaurants with a location) are stored cell by cell in cell key
+    order, so an occupied cell, or a run of cells along one grid row, is a
+    contiguous range of rows found by binary search over the cell keys.
+    """
+    CELL_LNG_OFFSET = 1 << 31
+
+    def __init__(self, cell_keys: Sequence[int], cell_starts: Sequence[int], positions: Sequence[int],
+                 lats_rad: Sequence[float], lngs_rad: Sequence[float], cos_lats: Sequence[float],
+                 cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        # Sorted cell keys, and the first row of each cell (one extra entry for the end)
+        self.cell_keys = cell_keys
+        self.cell_starts = cell_starts
+        # Per row: catalog position and coordinates
+        self.positions = positions
+        self.lats_rad = lats_rad
+        self.lngs_rad = lngs_rad
+        self.cos_lats = cos_lats
+
+    @classmethod
+    def build(cls, coordinates: List[tuple], cell_deg: float = 0.01) -> "SpatialGrid":
+        # coordinates: (position, lat, lng) for every restaurant with a location
+        cells: Dict[int, List[tuple]] = {}
+        for position, lat, lng in coordinates:
+            key = cls._cell_key(floor(lat / cell_deg), floor(lng / cell_deg))
+            cells.setdefault(key, []).append((position, lat, lng))
+
+        cell_keys, cell_starts = array('q'), array('q', [0])
+        positions, lats_rad, lngs_rad, cos_lats = array('i'), array('d'), array('d'), array('d')
+        for key in sorted(cells):
+            for position, lat, lng in cells[key]:
+                positions.append(position)
+                lats_rad.append(radians(lat))
+                lngs_rad.append(radians(lng))
+                cos_lats.append(cos(radians(lat)))
+            cell_keys.append(key)
+            cell_starts.append(len(positions))
+        return cls(
+            memoryview(cell_keys), memoryview(cell_starts), memoryview(positions),
+            memoryview(lats_rad), memoryview(lngs_rad), memoryview(cos_lats), cell_deg,
+        )
 
-        # Filter by price level
-        if price_level is not None:
-            restaurants = [
-                r for r in restaurants
-                if r['price_level']['composite']['min'] is not None and
-                   r['price_level']['composite']['min'] <= price_level <=
-                   r['price_level']['composite']['max']
-            ]
+    def to_sections(self, name: str) -> dict:
+        return {
+            f"{name}.cell_deg": self.cell_deg,
+            f"{name}.cell_keys": self.cell_keys,
+            f"{name}.cell_starts": self.cell_starts,
+            f"{name}.positions": self.positions,
+            f"{name}.lats_rad": self.lats_rad,
+            f"{name}.lngs_rad": self.lngs_rad,
+            f"{name}.cos_lats": self.cos_lats,
+        }
 
-        # Return the filtered restaurants
-        return restaurants
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str) -> "SpatialGrid":
+        return cls(*(
+            mapped.section(f"{name}.{field}")
+            for field in ("cell_keys", "cell_starts", "positions", "lats_rad", "lngs_rad", "cos_lats", "cell_deg")
+        ))
+
+    @classmethod
+    def _cell_key(cls, cell_lat: int, cell_lng: int) -> int:
+        # Orders cells by grid row, then by column within the row
+        return cell_lat << 32 | (cell_lng + cls.CELL_LNG_OFFSET)
+
+    @classmethod
+    def _cell_of_key(cls, key: int) -> tuple:
+        return (key >> 32, (key & 0xFFFFFFFF) - cls.CELL_LNG_OFFSET)
+
+    def _cell(self, lat: float, lng: float) -> tuple:
+        return (floor(lat / self.cell_deg), floor(lng / self.cell_deg))
+
+    def _km_per_degree_lng(self, max_abs_lat: float) -> float:
+        # Degrees of longitude shrink towards the poles; use the worst case
+        return KM_PER_DEGREE_LAT * max(cos(radians(min(max_abs_lat, 89.9))), 1e-6)
+
+    def _row_range(self, cell_lat: int, lng_lo: int, lng_hi: int) -> tuple:
+        """Rows of the cells from lng_lo to lng_hi in one grid row, as (start, stop)."""
+        i = bisect_left(self.cell_keys, self._cell_key(cell_lat, lng_lo))
+        j = bisect_right(self.cell_keys, self._cell_key(cell_lat, lng_hi))
+        return (self.cell_starts[i], self.cell_starts[j])
+
+    def _cell_rows(self, i: int) -> tuple:
+        return (self.cell_starts[i], self.cell_starts[i + 1])
+
+    def _rows_in_box(self, lat: float, lng: float, radius_km: float) -> List[tuple]:
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlng = radius_km / self._km_per_degree_lng(abs(lat) + dlat)
+        lat_lo, lng_lo = self._cell(lat - dlat, lng - dlng)
+        lat_hi, lng_hi = self._cell(lat + dlat, lng + dlng)
+
+        if lat_hi - lat_lo + 1 > len(self.cell_keys):
+            # The box spans more grid rows than there are occupied cells:
+            # walk the occupied cells instead
+            ranges = []
+            for i, key in enumerate(self.cell_keys):
+                cell_lat, cell_lng = self._cell_of_key(key)
+                if lat_lo <= cell_lat <= lat_hi and lng_lo <= cell_lng <= lng_hi:
+                    ranges.append(self._cell_rows(i))
+            return ranges
+
+        return [self._row_range(cell_lat, lng_lo, lng_hi) for cell_lat in range(lat_lo, lat_hi + 1)]
+
+    def _rows_in_ring(self, center: tuple, ring: int) -> List[tuple]:
+        c_lat, c_lng = center
+        if ring == 0:
+            return [self._row_range(c_lat, c_lng, c_lng)]
+        ranges = []
+        for cell_lat in range(c_lat - ring, c_lat + ring + 1):
+            if cell_lat in (c_lat - ring, c_lat + ring):
+                ranges.append(self._row_range(cell_lat, c_lng - ring, c_lng + ring))
+            else:
+                ranges.append(self._row_range(cell_lat, c_lng - ring, c_lng - ring))
+                ranges.append(self._row_range(cell_lat, c_lng + ring, c_lng + ring))
+        return ranges
+
+    def _distances(self, lat: float, lng: float, ranges: List[tuple]) -> Iterator[tuple]:
+        """(distance_km, row) for every row in the given (start, stop) ranges."""
+        for start, stop in ranges:
+            if start < stop:
+                distances = haversine_distances(
+                    lat, lng, self.lats_rad[start:stop], self.lngs_rad[start:stop], self.cos_lats[start:stop]
+                )
+                yield from zip(distances, range(start, stop))
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[tuple]:
+        """
+        All (distance_km, position) pairs within radius_km, nearest first.
+        """
+        ranges = self._rows_in_box(lat, lng, radius_km)
+        return sorted(
+            (d, self.positions[row]) for d, row in self._distances(lat, lng, ranges) if d <= radius_km
+        )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error retrieving restaurants: {str(e)}"
+    def _ring_min_km(self, lat: float, ring: int) -> float:
+        # Anything in this ring of cells around the query cell, or beyond, is
+        # at least this far away
+        return max(ring - 1, 0) * self.cell_deg * min(
+            KM_PER_DEGREE_LAT, self._km_per_degree_lng(abs(lat) + ring * self.cell_deg)
         )
 
-# Fallback function for when cache fails
-async def get_restaurants_from_firestore():
-    restaurants = db.collection("restaurants").get()
-    return [validate_and_serialize(doc.to_dict()) for doc in restaurants]
+    def nearest(self, lat: float, lng: float, k: int, radius_km: Optional[float] = None) -> List[tuple]:
+        """
+        The k nearest (distance_km, position) pairs, optionally capped at radius_km.
+        Rings of cells are visited outwards from the query cell until no unvisited
+        cell can hold anything closer than the current k-th result. Once the
+        rings would cover more cells than are occupied, the remaining occupied
+        cells are visited directly, nearest ring first.
+        """
+        if k <= 0 or not len(self.cell_keys):
+            return []
+        center = self._cell(lat, lng)
+        best: List[tuple] = []  # max-heap of (-distance, -position)
+
+        def done(ring: int) -> bool:
+            ring_min_km = self._ring_min_km(lat, ring)
+            if radius_km is not None and ring_min_km > radius_km:
+                return True
+            return len(best) == k and ring_min_km > -best[0][0]
+
+        def consider(ranges: List[tuple]):
+            for d, row in self._distances(lat, lng, ranges):
+                if radius_km is not None and d > radius_km:
+                    continue
+                item = (-d, -self.positions[row])
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        ring = 0
+        while (2 * ring + 1) ** 2 <= len(self.cell_keys):
+            if done(ring):
+                return sorted((-neg_d, -neg_position) for neg_d, neg_position in best)
+            consider(self._rows_in_ring(center, ring))
+            ring += 1
+
+        # The next ring holds more cells than the grid has occupied: rank the
+        # occupied cells not visited yet by their ring instead
+        remaining = []
+        for i, key in enumerate(self.cell_keys):
+            cell_lat, cell_lng = self._cell_of_key(key)
+            remaining.append((max(abs(cell_lat - center[0]), abs(cell_lng - center[1])), i))
+        remaining.sort()
+        for cell_ring, i in remaining:
+            if cell_ring < ring:
+                continue
+            if done(cell_ring):
+                break
+            consider([self._cell_rows(i)])
 
-@app.get("/restaurants/search", response_model=List[dict])
-async def search_restaurants(
-    query: Optional[str] = None,
-    cuisine: Optional[str] = None,
-    price_level: Optional[int] = None
-):
+        return sorted((-neg_d, -neg_position) for neg_d, neg_position in best)
+
+def normalize_name(text: Optional[str]) -> str:
     """
-    Search for restaurants in the cache based on:
-    - `query`: Keywords in name (gmaps or yelp).
-    - `cuisine`: Matches types in gmaps or yelp.
-    - `price_level`: Matches normalized price levels.
+    Normalize a restaurant name or query for matching: strip accents and
+    apostrophes, case-fold, and collapse punctuation and whitespace to one space.
     """
-    try:
-        # Ensure the cache file exists
-        if not os.path.exists('restaurant_cache.json'):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Cache file not found. Please refresh the cache."
-            )
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"['\u2019\u2018`]", "", text.casefold())
+    return " ".join(re.findall(r"\w+", text))
+
+class NameIndex:
+    """
+    Inverted index over normalized gmaps and yelp names.
+    - token postings: whole token -> positions, ascending
+    - prefix postings: token prefix -> positions, ordered by popularity
+    - trigram postings: character trigram of the full name -> positions
+    """
+    MAX_PREFIX_LEN = 12
+
+    def __init__(self, names: Sequence[tuple], tokens: PostingsMap, prefixes: PostingsMap,
+                 trigrams: PostingsMap, popularity_rank: Sequence[int]):
+        # Normalized names per position
+        self.names = names
+        self.tokens = tokens
+        self.prefixes = prefixes
+        self.trigrams = trigrams
+        self.popularity_rank = popularity_rank
+
+    @classmethod
+    def build(cls, gmaps_names: Sequence[str], yelp_names: Sequence[str],
+              popularity_rank: Sequence[int]) -> "NameIndex":
+        names = []
+        tokens: Dict[str, List[int]] = {}
+        prefixes: Dict[str, set] = {}
+        trigrams: Dict[str, List[int]] = {}
+        for position, (gmaps_name, yelp_name) in enumerate(zip(gmaps_names, yelp_names)):
+            normalized = tuple(n for n in {normalize_name(gmaps_name), normalize_name(yelp_name)} if n)
+            names.append(normalized)
+            position_tokens, position_trigrams = set(), set()
+            for name in normalized:
+                position_tokens.update(name.split())
+                position_trigrams |= cls._trigrams(name)
+            for token in position_tokens:
+                tokens.setdefault(token, []).append(position)
+                for length in range(1, min(len(token), cls.MAX_PREFIX_LEN) + 1):
+                    prefixes.setdefault(token[:length], set()).add(position)
+            for trigram in position_trigrams:
+                trigrams.setdefault(trigram, []).append(position)
+
+        return cls(
+            names,
+            PostingsMap.build(tokens),
+            PostingsMap.build({
+                prefix: sorted(positions, key=popularity_rank.__getitem__)
+                for prefix, positions in prefixes.items()
+            }),
+            PostingsMap.build(trigrams),
+            popularity_rank,
+        )
 
-        # Load the cache
-        async with aiofiles.open('restaurant_cache.json', 'r') as f:
-            content = await f.read()
-            restaurants = json.loads(content)
+    def to_sections(self, name: str) -> dict:
+        return {
+            f"{name}.names": ["\n".join(normalized) for normalized in self.names],
+            **self.tokens.to_sections(f"{name}.tokens"),
+            **self.prefixes.to_sections(f"{name}.prefixes"),
+            **self.trigrams.to_sections(f"{name}.trigrams"),
+        }
 
-        # Start with all restaurants
-        filtered_restaurants = restaurants
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str, popularity_rank: Sequence[int]) -> "NameIndex":
+        # Normalized names never contain a newline
+        return cls(
+            mapped.section(f"{name}.names", lambda joined: tuple(joined.split("\n")) if joined else ()),
+            PostingsMap.from_sections(mapped, f"{name}.tokens"),
+            PostingsMap.from_sections(mapped, f"{name}.prefixes"),
+            PostingsMap.from_sections(mapped, f"{name}.trigrams"),
+            popularity_rank,
+        )
 
-        # Filter by query in names
-        if query:
-            query_lower = query.lower()
-            filtered_restaurants = [
-                r for r in filtered_restaurants
-                if query_lower in r["name"]["gmaps"].lower() or query_lower in r["name"]["yelp"].lower()
-            ]
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
 
-        # Filter by cuisine
-        if cuisine:
-            cuisine_lower = cuisine.lower()
-            filtered_restaurants = [
-                r for r in filtered_restaurants
-                if cuisine_lower in r["types"]["gmaps"] or cuisine_lower in r["types"]["yelp"]
-            ]
+    def _prefix_count(self, token: str) -> int:
+        return len(self.prefixes.get(token[:self.MAX_PREFIX_LEN], ()))
 
-        # Filter by price level
-        if price_level is not None:
-            filtered_restaurants = [
-                r for r in filtered_restaurants
-                if r["price_level"]["composite"]["min"] is not None and
-                   r["price_level"]["composite"]["min"] <= price_level <=
-                   r["price_level"]["composite"]["max"]
-            ]
+    def _prefix_matches(self, token: str) -> set:
+        positions = self.prefixes.get(token[:self.MAX_PREFIX_LEN], ())
+        if len(token) <= self.MAX_PREFIX_LEN:
+            return set(positions)
+        return {
+            p for p in positions
+            if any(t.startswith(token) for name in self.names[p] for t in name.split())
+        }
 
-        return filtered_restaurants
+    def _token_matches(self, query_tokens: List[str]) -> set:
+        """Positions where every query token is a prefix of some name token."""
+        result = None
+        for token in sorted(query_tokens, key=self._prefix_count):
+            matches = self._prefix_matches(token)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result or set()
+
+    def substring_matches(self, query: str) -> set:
+        """
+        Positions whose normalized gmaps or yelp name contains the query. A query
+        with nothing left after normalization (e.g. only punctuation) matches nothing.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return set()
+        trigrams = self._trigrams(normalized)
+        if trigrams:
+            candidates = None
+            for trigram in sorted(trigrams, key=lambda t: len(self.trigrams.get(t, ()))):
+                postings = self.trigrams.get(trigram)
+                if not postings:
+                    return set()
+                candidates = set(postings) if candidates is None else candidates.intersection(postings)
+                if not candidates:
+                    return set()
+        else:
+            candidates = range(len(self.names))
+        return {p for p in candidates if any(normalized in name for name in self.names[p])}
+
+    def search(self, query: str) -> List[int]:
+        """
+        Ranked name search. A restaurant matches when its name contains the
+        query, or when every query token prefixes one of its name tokens.
+        Exact names rank first, then names starting with the query, then whole
+        token matches, then other matches; ties are broken by popularity.
+        A query with nothing left after normalization matches nothing.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        query_tokens = normalized.split()
+        matches = self._token_matches(query_tokens) | self.substring_matches(normalized)
+        has_tokens = self._whole_token_test(query_tokens)
+
+        def score(position: int) -> int:
+            names = self.names[position]
+            if normalized in names:
+                return 0
+            if any(name.startswith(normalized) for name in names):
+                return 1
+            if has_tokens(position):
+                return 2
+            return 3
+
+        return sorted(matches, key=lambda p: (score(p), self.popularity_rank[p]))
+
+    def _whole_token_test(self, query_tokens: List[str]) -> Callable[[int], bool]:
+        """Test for positions where every query token is a whole name token."""
+        postings = [self.tokens.get(token, ()) for token in query_tokens]
+        return lambda position: all(sorted_contains(run, position) for run in postings)
+
+    def _top_prefix_matches(self, prefix: str, limit: int) -> List[int]:
+        # Postings are already ordered by popularity
+        return list(self.prefixes.get(prefix, ())[:limit])
+
+    def autocomplete(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Top `limit` positions whose names prefix-match the query, most popular first.
+        """
+        normalized = normalize_name(query)
+        query_tokens = normalized.split()
+        if not query_tokens or limit <= 0:
+            return []
+        if len(query_tokens) == 1 and len(query_tokens[0]) <= self.MAX_PREFIX_LEN:
+            return self._top_prefix_matches(query_tokens[0], limit)
+        matches = self._token_matches(query_tokens)
+        # Names that read like the typed text come before other token matches
+        return heapq.nsmallest(limit, matches, key=lambda p: (
+            not any(name.startswith(normalized) for name in self.names[p]),
+            self.popularity_rank[p],
+        ))
+
+# Bitmaps are walked a byte at a time: the set bits of every byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def bitmap_count(bitmap: int) -> int:
+    return bitmap.bit_count()
+
+def bitmap_bytes(bitmap: int) -> bytes:
+    return bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+
+def iter_bitmap_positions(bitmap: int) -> Iterator[int]:
+    """Positions of the set bits, ascending, decoded lazily."""
+    for index, value in enumerate(bitmap_bytes(bitmap)):
+        if value:
+            for bit in _BYTE_BITS[value]:
+                yield index << 3 | bit
+
+def bitmap_positions(bitmap: int, limit: Optional[int] = None) -> List[int]:
+    """Positions of the set bits, ascending; only the first `limit` when given."""
+    if limit is not None:
+        return list(islice(iter_bitmap_positions(bitmap), limit))
+    return [
+        index << 3 | bit
+        for index, value in enumerate(bitmap_bytes(bitmap)) if value
+        for bit in _BYTE_BITS[value]
+    ]
+
+def bitmap_contains(bitmap: int) -> Callable[[int], bool]:
+    """
+    Membership test for testing many positions against one bitmap: a byte
+    lookup per position instead of shifting the whole int.
+    """
+    data = bitmap_bytes(bitmap)
+    size = len(data) << 3
+    return lambda i: i < size and data[i >> 3] >> (i & 7) & 1 == 1
+
+def bitmap_from_positions(positions: Iterable[int], count: int) -> int:
+    """Bitmap with the given positions (all below `count`) set."""
+    data = bytearray((count + 7) // 8)
+    for i in positions:
+        data[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(data, "little")
+
+class FacetIndex:
+    """
+    Bitmaps (Python ints, bit i = catalog position i) for the cuisine and
+    price_level filters. Combining filters is a bitwise AND and facet counts
+    are popcounts, so neither touches the restaurant dicts.
+    """
+    def __init__(self, count: int, cuisines: Mapping, price_levels: Mapping, all_bitmap: Optional[int] = None):
+        self.count = count
+        # Every position holding a restaurant
+        self.all = (1 << count) - 1 if all_bitmap is None else all_bitmap
+        self.cuisines = cuisines
+        self.price_levels = price_levels
+
+    @classmethod
+    def build(cls, columns: CatalogColumns) -> "FacetIndex":
+        # Positions per value first: OR-ing single bits into growing ints is quadratic
+        cuisines: Dict[str, List[int]] = {}
+        price_levels: Dict[int, List[int]] = {}
+        price_min, price_max = columns.floats["price_min"], columns.floats["price_max"]
+        for i, types in enumerate(columns.types):
+            for cuisine in {t.lower() for t in types}:
+                cuisines.setdefault(cuisine, []).append(i)
+
+            # A restaurant matches every whole price level inside its composite range
+            low, high = price_min[i], price_max[i]
+            if not isnan(low) and not isnan(high):
+                for level in range(ceil(low), floor(high) + 1):
+                    price_levels.setdefault(level, []).append(i)
+
+        return cls(
+            columns.count,
+            BitmapMap.build({
+                cuisine: bitmap_from_positions(positions, columns.count) for cuisine, positions in cuisines.items()
+            }, columns.count),
+            BitmapMap.build({
+                level: bitmap_from_positions(positions, columns.count) for level, positions in price_levels.items()
+            }, columns.count),
+        )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to search restaurants: {str(e)}"
+    def to_sections(self, name: str) -> dict:
+        return {
+            **self.cuisines.to_sections(f"{name}.cuisines"),
+            **self.price_levels.to_sections(f"{name}.price_levels"),
+        }
+
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str) -> "FacetIndex":
+        return cls(
+            mapped.count,
+            BitmapMap.from_sections(mapped, f"{name}.cuisines", mapped.count),
+            BitmapMap.from_sections(mapped, f"{name}.price_levels", mapped.count),
         )
 
-@app.get("/restaurants/popular", response_model=List[dict])
-async def get_popular_restaurants(limit: int = 10):
+    def filter(self, cuisine: Optional[str] = None, price_level: Optional[int] = None) -> int:
+        bitmap = self.all
+        if cuisine:
+            bitmap &= self.cuisines.get(cuisine.lower(), 0)
+        if price_level is not None:
+            bitmap &= self.price_levels.get(price_level, 0)
+        return bitmap
+
+    def counts(self, bitmap: int) -> dict:
+        """Number of restaurants per cuisine and per price level within a result bitmap."""
+        cuisines = {}
+        for cuisine, cuisine_bitmap in self.cuisines.items():
+            count = bitmap_count(bitmap & cuisine_bitmap)
+            if count:
+                cuisines[cuisine] = count
+        price_levels = {}
+        for level in sorted(self.price_levels):
+            count = bitmap_count(bitmap & self.price_levels[level])
+            if count:
+                price_levels[level] = count
+        return {
+            "cuisine": dict(sorted(cuisines.items(), key=lambda item: (-item[1], item[0]))),
+            "price_level": price_levels,
+        }
+
+RATING_PRIOR_REVIEWS = 50  # Weight of the catalog-wide mean in the composite score
+
+def bayesian_rating_scores(columns: CatalogColumns, prior_mean: Optional[float] = None) -> tuple:
     """
-    Retrieve the most popular restaurants sorted by:
-    - Highest rating (`rating`).
-    - Most reviews (`user_ratings_total`) as a tiebreaker.
+    Composite rating per restaurant combining gmaps and yelp ratings.
+    Each source contributes rating * total_ratings; the catalog-wide mean rating
+    is added as RATING_PRIOR_REVIEWS pseudo-reviews, so a few perfect reviews do
+    not outrank hundreds of good ones. Pass `prior_mean` to score records
+    against another catalog's mean. Returns (scores, prior_mean).
     """
-    try:
-        # Ensure the cache file exists
-        if not os.path.exists('restaurant_cache.json'):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Cache file not found. Please refresh the cache."
-            )
+    weighted_sums = array('d', bytes(8 * columns.count))
+    review_counts = array('d', bytes(8 * columns.count))
+    for source in ("gmaps", "yelp"):
+        ratings = columns.floats[f"{source}_rating"]
+        totals = columns.floats[f"{source}_total"]
+        for i, (rating, total) in enumerate(zip(ratings, totals)):
+            if not isnan(rating) and not isnan(total) and total:
+                weighted_sums[i] += rating * total
+                review_counts[i] += total
+
+    if prior_mean is None:
+        total_reviews = sum(review_counts)
+        prior_mean = sum(weighted_sums) / total_reviews if total_reviews else 0.0
+    prior_sum = RATING_PRIOR_REVIEWS * prior_mean
+    scores = array('d', (
+        (prior_sum + weighted_sum) / (RATING_PRIOR_REVIEWS + count)
+        for weighted_sum, count in zip(weighted_sums, review_counts)
+    ))
+    return scores, prior_mean
+
+def with_composite_scores(restaurants: Sequence[dict], scores: Sequence[float]) -> List[dict]:
+    # Copies, so the input dicts (possibly another catalog's) stay untouched
+    return [
+        {**r, "ratings": {**(r.get("ratings") or {}), "composite": {"score": round(score, 4)}}}
+        for r, score in zip(restaurants, scores)
+    ]
+
+class PopularityIndex:
+    """
+    Popularity rankings materialized at catalog build time: the global order
+    plus one pre-sorted run per cuisine and per price level, so a top-N
+    request is a slice.
+    """
+    def __init__(self, order: Sequence[int], rank: Sequence[int], by_cuisine: PostingsMap,
+                 by_price_level: PostingsMap, facets: FacetIndex):
+        self.order = order
+        self.rank = rank
+        self.by_cuisine = by_cuisine
+        self.by_price_level = by_price_level
+        self.facets = facets
+
+    @classmethod
+    def build(cls, count: int, facets: FacetIndex, sort_key) -> "PopularityIndex":
+        # sort_key(position) orders the most popular restaurant first
+        order = array('i', sorted(range(count), key=sort_key))
+        rank = array('i', [0]) * count
+        for position_rank, i in enumerate(order):
+            rank[i] = position_rank
+
+        def ranked(bitmaps: Mapping) -> PostingsMap:
+            return PostingsMap.build({
+                key: sorted(bitmap_positions(bitmap), key=rank.__getitem__) for key, bitmap in bitmaps.items()
+            })
 
-        # Load the cache
-        async with aiofiles.open('restaurant_cache.json', 'r') as f:
-            content = await f.read()
-            restaurants = json.loads(content)
-
-        # Sort restaurants by rating (descending) and then by total ratings (descending)
-        sorted_restaurants = sorted(
-            restaurants,
-            key=lambda r: (
-                r["ratings"]["gmaps"]["rating"],  # Primary: gmaps rating
-                r["ratings"]["gmaps"]["total_ratings"],  # Secondary: gmaps total ratings
-            ),
-            reverse=True
+        return cls(
+            memoryview(order), memoryview(rank),
+            ranked(facets.cuisines), ranked(facets.price_levels), facets,
         )
 
-        # Limit the results
-        return sorted_restaurants[:limit]
+    def to_sections(self, name: str) -> dict:
+        return {
+            f"{name}.order": self.order,
+            f"{name}.rank": self.rank,
+            **self.by_cuisine.to_sections(f"{name}.by_cuisine"),
+            **self.by_price_level.to_sections(f"{name}.by_price_level"),
+        }
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve popular restaurants: {str(e)}"
+    @classmethod
+    def from_sections(cls, mapped: "MappedCatalogFile", name: str, facets: FacetIndex) -> "PopularityIndex":
+        return cls(
+            mapped.section(f"{name}.order"),
+            mapped.section(f"{name}.rank"),
+            PostingsMap.from_sections(mapped, f"{name}.by_cuisine"),
+            PostingsMap.from_sections(mapped, f"{name}.by_price_level"),
+            facets,
         )
 
-@app.get("/restaurants/nearby")
-async def get_nearby_restaurants(lat: float, lng: float, radius_km: float = 2.0):
+    def ranked(self, cuisine: Optional[str] = None, price_level: Optional[int] = None) -> Iterable[int]:
+        """Positions matching the filters, most popular first, produced lazily."""
+        if cuisine and price_level is not None:
+            # No materialized run for the combination: filter the shorter
+            # ranked run by the other bitmap
+            by_cuisine = self.by_cuisine.get(cuisine.lower(), ())
+            by_price_level = self.by_price_level.get(price_level, ())
+            if len(by_cuisine) <= len(by_price_level):
+                ranked, other = by_cuisine, self.facets.price_levels.get(price_level, 0)
+            else:
+                ranked, other = by_price_level, self.facets.cuisines.get(cuisine.lower(), 0)
+            return filter(bitmap_contains(other), ranked)
+        if cuisine:
+            return self.by_cuisine.get(cuisine.lower(), ())
+        if price_level is not None:
+            return self.by_price_level.get(price_level, ())
+        return self.order
+
+    def top(self, limit: int, cuisine: Optional[str] = None, price_level: Optional[int] = None) -> List[int]:
+        if limit <= 0:
+            return []
+        return list(islice(self.ranked(cuisine, price_level), limit))
+
+# Binary catalog file. Refreshes publish it next to the JSON snapshot; every
+# uvicorn worker maps it read-only, so the columns, the encoded records and
+# every derived index are shared through the page cache instead of being
+# parsed or rebuilt in each worker's heap. Layout:
+#   magic | u64 header length | JSON header | 8-byte aligned sections
+# The header lists each named section as [typecode, offset, length] for an
+# array ('d', 'q', 'i' or 'B' for raw bytes) or ["str", offsets, data, length]
+# for a string column, a u64 offsets array (length + 1 entries) followed by the
+# UTF-8 data. Scalars are kept in the header under "values".
+RESTAURANT_CATALOG_FILE = 'restaurant_catalog.bin'
+CATALOG_FILE_MAGIC = b"RCATv2\0\0"
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "2"))
+
+def catalog_file_stat(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+def write_catalog_file(path: str, catalog: "RestaurantCatalog", snapshot_version: Optional[int]) -> tuple:
     """
-    Retrieve restaurants within a given radius (in kilometers) of a specific location.
+    Publish a built catalog, records and indexes, as a mapped catalog file.
+    Returns the identity (inode, mtime, size) of the written file.
     """
-    try:
-        # Ensure the cache file exists
-        if not os.path.exists('restaurant_cache.json'):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Cache file not found. Please refresh the cache."
-            )
+    header = {
+        "count": len(catalog),
+        "byteorder": sys.byteorder,
+        "snapshot_version": snapshot_version,
+        "sections": {},
+        "values": {},
+    }
+    body = bytearray()
+
+    def add_section(data: bytes) -> int:
+        body.extend(b"\0" * (_align8(len(body)) - len(body)))
+        offset = len(body)
+        body.extend(data)
+        return offset
+
+    for name, value in catalog.file_sections().items():
+        if isinstance(value, memoryview):
+            header["sections"][name] = [value.format, add_section(value.tobytes()), len(value)]
+        elif isinstance(value, (bytes, bytearray)):
+            header["sections"][name] = ["B", add_section(value), len(value)]
+        elif value is None or isinstance(value, (int, float)):
+            header["values"][name] = value
+        else:
+            encoded = [item.encode() for item in value]
+            offsets = array('Q', [0])
+            for item in encoded:
+                offsets.append(offsets[-1] + len(item))
+            header["sections"][name] = [
+                "str", add_section(offsets.tobytes()), add_section(b"".join(encoded)), len(encoded)
+            ]
 
-        # Load cached data
-        async with aiofiles.open('restaurant_cache.json', 'r') as f:
-            content = await f.read()
-            restaurants = json.loads(content)
-
-        def haversine_distance(lat1, lng1, lat2, lng2):
-            """
-            Calculate the great-circle distance between two points on Earth.
-            """
-            # Convert latitude and longitude from degrees to radians
-            lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-            
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlng = lng2 - lng1
-            a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlng / 2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            earth_radius_km = 6371  # Radius of Earth in kilometers
-            return earth_radius_km * c
-
-        # Filter restaurants within the radius
-        nearby = []
-        for restaurant in restaurants:
-            location = restaurant.get("location", {}).get("gmaps", {})
-            r_lat = location.get("lat")
-            r_lng = location.get("lng")
-
-            # Skip if location data is missing
-            if r_lat is None or r_lng is None:
-                continue
+    header_bytes = json.dumps(header).encode()
+    prefix = CATALOG_FILE_MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes
+    prefix += b"\0" * (_align8(len(prefix)) - len(prefix))
+    write_file_atomic(path, prefix + bytes(body))
+    return catalog_file_stat(path)
+
+class MappedStrings(Sequence):
+    """
+    Read-only string column over a mapped catalog file. With `decode`, each
+    value is decoded on first access and kept, so a worker parses every record
+    at most once. Decoded values are shared and must not be mutated.
+    """
+    def __init__(self, buffer: memoryview, offsets: memoryview, decode=None):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.decode = decode
+        self.decoded = [None] * (len(offsets) - 1) if decode else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if self.decoded is not None:
+            value = self.decoded[i]
+            if value is None:
+                value = self.decoded[i] = self.decode(self._raw(i))
+            return value
+        return self._raw(i)
+
+    def _raw(self, i: int) -> str:
+        return str(self.buffer[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+class MappedCatalogFile:
+    """A catalog file mapped read-only into memory."""
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.stat = catalog_file_stat(path)
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mmap)
+        if bytes(view[:len(CATALOG_FILE_MAGIC)]) != CATALOG_FILE_MAGIC:
+            raise ValueError(f"{path} is not a restaurant catalog file")
+        header_start = len(CATALOG_FILE_MAGIC) + 8
+        (header_length,) = struct.unpack("<Q", view[len(CATALOG_FILE_MAGIC):header_start])
+        self.header = json.loads(bytes(view[header_start:header_start + header_length]))
+        self.body = view[_align8(header_start + header_length):]
+        self.count = self.header["count"]
+        self.byteorder = self.header["byteorder"]
+        self.snapshot_version = self.header["snapshot_version"]
+
+    def section(self, name: str, decode=None):
+        """
+        A named section: a memoryview over an array, a MappedStrings (values
+        decoded with `decode` when given), or a scalar from the header.
+        """
+        if name in self.header["values"]:
+            return self.header["values"][name]
+        kind, offset, *rest = self.header["sections"][name]
+        if kind == "str":
+            data_at, length = rest
+            offsets = self.body[offset:offset + 8 * (length + 1)].cast('Q')
+            return MappedStrings(self.body[data_at:], offsets, decode)
+        (length,) = rest
+        section = self.body[offset:offset + length * struct.calcsize(kind)]
+        return section if kind == "B" else section.cast(kind)
+
+    def columns(self) -> CatalogColumns:
+        return CatalogColumns(
+            self.count,
+            {name: self.section(f"columns.{name}") for name in CatalogColumns.FLOAT_COLUMNS},
+            {name: self.section(f"columns.{name}") for name in CatalogColumns.STRING_COLUMNS},
+            self.section("columns.types", json.loads),
+        )
 
-            # Calculate the distance using Haversine formula
-            distance = haversine_distance(lat, lng, r_lat, r_lng)
-            if distance <= radius_km:
-                nearby.append(restaurant)
+    def records(self) -> MappedStrings:
+        return self.section("records", json.loads)
 
-        return nearby
+class RestaurantCatalog:
+    """
+    In-memory snapshot of the restaurant cache.
+    A catalog is never mutated after it is built; refreshes build a new one
+    and swap it in, so a request keeps a consistent view while it runs.
+    `restaurants` is a list of dicts, or a lazily decoded sequence when the
+    catalog is served from a mapped catalog file, in which case the indexes
+    are read from the file as well instead of being rebuilt.
+    `snapshot_version` is the cache snapshot the catalog holds, shared by every
+    worker; None when it was patched locally (live updates) or predates snapshots.
+    """
+    def __init__(self, restaurants: Sequence[dict], version: int,
+                 columns: Optional[CatalogColumns] = None, source_stat: Optional[tuple] = None,
+                 snapshot_version: Optional[int] = None, mapped: Optional[MappedCatalogFile] = None):
+        self.restaurants = restaurants
+        self.version = version
+        self.snapshot_version = snapshot_version
+        self.loaded_at = datetime.utcnow().isoformat()
+        # Identity of the catalog file this catalog was loaded from or written to
+        self.source_stat = source_stat
+        if mapped is not None:
+            self._load_indexes(mapped)
+        else:
+            self._build_indexes(columns)
+
+    def _build_indexes(self, columns: Optional[CatalogColumns]):
+        from_records = columns is None
+        if from_records:
+            columns = CatalogColumns.from_records(self.restaurants)
+        self.columns = columns
+
+        # Primary-key indexes: gmaps place_id and yelp business id -> position
+        by_place_id: Dict[str, int] = {}
+        by_yelp_id: Dict[str, int] = {}
+        for i, (place_id, yelp_id) in enumerate(zip(columns.strings["place_id"], columns.strings["yelp_id"])):
+            if place_id:
+                by_place_id[place_id] = i
+            if yelp_id:
+                by_yelp_id[yelp_id] = i
+        self.by_place_id = KeyIndex.build(by_place_id)
+        self.by_yelp_id = KeyIndex.build(by_yelp_id)
+
+        # Spatial index over the gmaps coordinates
+        self.spatial = SpatialGrid.build([
+            (i, r_lat, r_lng)
+            for i, (r_lat, r_lng) in enumerate(zip(columns.floats["lat"], columns.floats["lng"]))
+            if not isnan(r_lat) and not isnan(r_lng)
+        ])
+
+        # Cuisine and price level bitmaps
+        self.facets = FacetIndex.build(columns)
+
+        # Composite cross-source rating, also exposed on each record. Records are
+        # copied rather than updated in place, since the input dicts may belong to
+        # an older catalog still serving cursors.
+        scores, self.rating_prior_mean = bayesian_rating_scores(columns)
+        self.scores = memoryview(scores)
+        if from_records:
+            self.restaurants = with_composite_scores(self.restaurants, self.scores)
+
+        # Popularity rankings: gmaps rating then gmaps total ratings, or composite score
+        gmaps_rating, gmaps_total = columns.floats["gmaps_rating"], columns.floats["gmaps_total"]
+        def gmaps_rating_key(i):
+            rating, total = gmaps_rating[i], gmaps_total[i]
+            return (-(0 if isnan(rating) else rating), -(0 if isnan(total) else total), i)
+        self.popularity = PopularityIndex.build(columns.count, self.facets, gmaps_rating_key)
+        self.score_popularity = PopularityIndex.build(columns.count, self.facets, lambda i: (-scores[i], i))
+
+        # Name search index
+        self.names = NameIndex.build(
+            columns.strings["gmaps_name"], columns.strings["yelp_name"], self.popularity.rank
+        )
 
-    except Exception as e:
+    def _load_indexes(self, mapped: MappedCatalogFile):
+        self.columns = mapped.columns()
+        self.by_place_id = KeyIndex.from_sections(mapped, "by_place_id")
+        self.by_yelp_id = KeyIndex.from_sections(mapped, "by_yelp_id")
+        self.spatial = SpatialGrid.from_sections(mapped, "spatial")
+        self.facets = FacetIndex.from_sections(mapped, "facets")
+        self.scores = mapped.section("scores")
+        self.rating_prior_mean = mapped.section("rating_prior_mean")
+        self.popularity = PopularityIndex.from_sections(mapped, "popularity", self.facets)
+        self.score_popularity = PopularityIndex.from_sections(mapped, "score_popularity", self.facets)
+        self.names = NameIndex.from_sections(mapped, "names", self.popularity.rank)
+
+    def file_sections(self) -> dict:
+        """Everything write_catalog_file stores, by section name."""
+        columns = self.columns
+        return {
+            **{f"columns.{name}": memoryview(array('d', columns.floats[name])) for name in CatalogColumns.FLOAT_COLUMNS},
+            **{f"columns.{name}": columns.strings[name] for name in CatalogColumns.STRING_COLUMNS},
+            "columns.types": [json.dumps(types) for types in columns.types],
+            "records": [json.dumps(r) for r in self.restaurants],
+            **self.by_place_id.to_sections("by_place_id"),
+            **self.by_yelp_id.to_sections("by_yelp_id"),
+            **self.spatial.to_sections("spatial"),
+            **self.facets.to_sections("facets"),
+            "scores": self.scores,
+            "rating_prior_mean": self.rating_prior_mean,
+            **self.popularity.to_sections("popularity"),
+            **self.score_popularity.to_sections("score_popularity"),
+            **self.names.to_sections("names"),
+        }
+
+    def __len__(self):
+        return len(self.restaurants)
+
+    def get(self, restaurant_id: str) -> Optional[dict]:
+        """
+        Look up a restaurant by gmaps place_id, falling back to yelp business id.
+        """
+        i = self.by_place_id.get(restaurant_id)
+        if i is None:
+            i = self.by_yelp_id.get(restaurant_id)
+        return self.restaurants[i] if i is not None else None
+
+    def ranking(self, sort: str) -> PopularityIndex:
+        if sort == "rating":
+            return self.popularity
+        if sort == "score":
+            return self.score_popularity
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve nearby restaurants: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="sort must be one of: rating, score"
         )
 
-@app.get("/restaurants/{place_id}")
-async def get_restaurant(place_id: str):
+    def order_by_score(self, positions: List[int]) -> List[int]:
+        return sorted(positions, key=self.score_popularity.rank.__getitem__)
+
+    def score_records(self, restaurants: List[dict]) -> List[dict]:
+        """
+        Copies of cache-shaped records that are not in the catalog, with a
+        composite score against this catalog's mean rating.
+        """
+        scores, _ = bayesian_rating_scores(CatalogColumns.from_records(restaurants), self.rating_prior_mean)
+        return with_composite_scores(restaurants, scores)
+
+    def get_many(self, restaurant_ids: List[str]):
+        """
+        Resolve many ids in one pass.
+        Returns (found, missing): found restaurants in request order and the
+        ids that are not in the catalog.
+        """
+        found, missing = [], []
+        for restaurant_id in restaurant_ids:
+            restaurant = self.get(restaurant_id)
+            if restaurant is None:
+                missing.append(restaurant_id)
+            else:
+                found.append(restaurant)
+        return found, missing
+
+# --- Live catalog patches ---
+# Live updates do not rebuild the catalog per change. The changed and added
+# restaurants are indexed on their own and layered over the last full build
+# (the base), whose indexes mask out every position that changed. Rankings
+# and composite scores of the base are kept as they are: a changed restaurant
+# keeps its rank and added ones rank after every base restaurant until the
+# next full rebuild, see rebuild_patched_restaurant_catalog.
+
+class PatchedSequence(Sequence):
+    """A base sequence with some positions replaced and positions appended past its end."""
+    def __init__(self, base: Sequence, replaced: Dict[int, Any], count: int):
+        self.base = base
+        self.replaced = replaced
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        if i in self.replaced:
+            return self.replaced[i]
+        return self.base[i]
+
+class PatchedKeyIndex(Mapping):
+    """A base key index with some keys moved or removed (None)."""
+    def __init__(self, base: Mapping, overlay: Dict[str, Optional[int]]):
+        self.base = base
+        self.overlay = overlay
+
+    def __getitem__(self, key) -> int:
+        if key in self.overlay:
+            position = self.overlay[key]
+            if position is None:
+                raise KeyError(key)
+            return position
+        return self.base[key]
+
+    def __iter__(self):
+        yield from (key for key in self.base if key not in self.overlay)
+        yield from (key for key, position in self.overlay.items() if position is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class PatchedBitmapMap(Mapping):
+    """Base facet bitmaps with the changed positions cleared, OR the bitmaps of the changed records."""
+    def __init__(self, base: Mapping, patched: Dict[Any, int], keep: int):
+        self.base = base
+        self.patched = patched
+        # Bitmap of the base positions that did not change
+        self.keep = keep
+        self.decoded: Dict[Any, int] = {}
+
+    def __getitem__(self, key) -> int:
+        bitmap = self.decoded.get(key)
+        if bitmap is None:
+            if key not in self.patched and key not in self.base:
+                raise KeyError(key)
+            bitmap = self.decoded[key] = (self.base.get(key, 0) & self.keep) | self.patched.get(key, 0)
+        return bitmap
+
+    def __iter__(self):
+        yield from self.base
+        yield from (key for key in self.patched if key not in self.base)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class PatchedSpatialGrid:
+    """Base grid results without the changed positions, merged with a grid over the changed records."""
+    def __init__(self, base: SpatialGrid, patched: SpatialGrid, dirty: set):
+        self.base = base
+        self.patched = patched
+        self.dirty = dirty
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[tuple]:
+        unchanged = [match for match in self.base.within(lat, lng, radius_km) if match[1] not in self.dirty]
+        return list(heapq.merge(unchanged, self.patched.within(lat, lng, radius_km)))
+
+    def nearest(self, lat: float, lng: float, k: int, radius_km: Optional[float] = None) -> List[tuple]:
+        # Ask the base for enough extra matches to cover the masked positions
+        unchanged = [
+            match for match in self.base.nearest(lat, lng, k + len(self.dirty), radius_km)
+            if match[1] not in self.dirty
+        ]
+        return list(islice(heapq.merge(unchanged, self.patched.nearest(lat, lng, k, radius_km)), k))
+
+class PatchedNameIndex(NameIndex):
+    """Base name index without the changed positions, merged with an index over the changed records."""
+    def __init__(self, base: NameIndex, patched: NameIndex, positions: List[int], dirty: set,
+                 names: Sequence[tuple], popularity_rank: Sequence[int]):
+        self.base = base
+        self.patched = patched
+        # Row in the patched index -> catalog position, and back
+        self.positions = positions
+        self.row_of = {position: row for row, position in enumerate(positions)}
+        self.dirty = dirty
+        self.names = names
+        self.popularity_rank = popularity_rank
+
+    def _patched_positions(self, rows: Iterable[int]) -> set:
+        return {self.positions[row] for row in rows}
+
+    def _prefix_count(self, token: str) -> int:
+        return self.base._prefix_count(token) + self.patched._prefix_count(token)
+
+    def _prefix_matches(self, token: str) -> set:
+        return (self.base._prefix_matches(token) - self.dirty) | self._patched_positions(
+            self.patched._prefix_matches(token)
+        )
+
+    def substring_matches(self, query: str) -> set:
+        return (self.base.substring_matches(query) - self.dirty) | self._patched_positions(
+            self.patched.substring_matches(query)
+        )
+
+    def _whole_token_test(self, query_tokens: List[str]) -> Callable[[int], bool]:
+        in_base = self.base._whole_token_test(query_tokens)
+        in_patched = self.patched._whole_token_test(query_tokens)
+        return lambda p: in_patched(self.row_of[p]) if p in self.row_of else in_base(p)
+
+    def _top_prefix_matches(self, prefix: str, limit: int) -> List[int]:
+        unchanged = (p for p in self.base.prefixes.get(prefix, ()) if p not in self.dirty)
+        patched = [self.positions[row] for row in self.patched.prefixes.get(prefix, ())]
+        return list(islice(heapq.merge(unchanged, patched, key=self.popularity_rank.__getitem__), limit))
+
+class PatchedPopularityIndex(PopularityIndex):
+    """Base rankings without the changed positions, merged with the changed records by rank."""
+    def __init__(self, base: PopularityIndex, rank: Sequence[int], facets: FacetIndex,
+                 live: List[int], dirty: set):
+        self.base = base
+        self.rank = rank
+        self.facets = facets
+        self.live = live
+        self.dirty = dirty
+
+    def ranked(self, cuisine: Optional[str] = None, price_level: Optional[int] = None) -> Iterable[int]:
+        unchanged = (p for p in self.base.ranked(cuisine, price_level) if p not in self.dirty)
+        patched = sorted(
+            filter(bitmap_contains(self.facets.filter(cuisine, price_level)), self.live),
+            key=self.rank.__getitem__,
+        )
+        return heapq.merge(unchanged, patched, key=self.rank.__getitem__)
+
+class PatchedRestaurantCatalog(RestaurantCatalog):
     """
-    Retrieve a single restaurant's full details from the cache by `place_id`.
+    A catalog with live changes layered over a fully built base catalog.
+    `records` maps every changed position to its current record, or None
+    once removed; positions past the end of the base are added restaurants.
+    Removed positions stay allocated until the next full rebuild. Patched
+    catalogs are per process and are never written to the catalog file.
     """
-    try:
-        # Ensure the cache file exists
-        if not os.path.exists('restaurant_cache.json'):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Cache file not found. Please refresh the cache."
-            )
+    def __init__(self, base: RestaurantCatalog, records: Dict[int, Optional[dict]], count: int,
+                 version: int, source_stat: Optional[tuple] = None):
+        self.base = base
+        self.records = records
+        self.version = version
+        self.snapshot_version = None
+        self.loaded_at = datetime.utcnow().isoformat()
+        self.source_stat = source_stat
+        self.restaurants = PatchedSequence(base.restaurants, records, count)
+
+        base_count = len(base)
+        dirty = {p for p in records if p < base_count}
+        live = sorted(p for p, r in records.items() if r is not None)
+        columns = CatalogColumns.from_records([records[p] for p in live])
+
+        # Primary keys: ids of the changed base records are dropped, the
+        # changed records' ids point at their positions
+        overlays = {"place_id": {}, "yelp_id": {}}
+        for name, overlay in overlays.items():
+            base_ids = base.columns.strings[name]
+            for p in dirty:
+                if base_ids[p]:
+                    overlay[base_ids[p]] = None
+            for row, p in enumerate(live):
+                if columns.strings[name][row]:
+                    overlay[columns.strings[name][row]] = p
+        self.by_place_id = PatchedKeyIndex(base.by_place_id, overlays["place_id"])
+        self.by_yelp_id = PatchedKeyIndex(base.by_yelp_id, overlays["yelp_id"])
+
+        self.spatial = PatchedSpatialGrid(base.spatial, SpatialGrid.build([
+            (p, r_lat, r_lng)
+            for p, r_lat, r_lng in zip(live, columns.floats["lat"], columns.floats["lng"])
+            if not isnan(r_lat) and not isnan(r_lng)
+        ]), dirty)
+
+        # Facet bitmaps of the changed records, by row, moved to their positions
+        patched_facets = FacetIndex.build(columns)
+        def at_positions(bitmaps: Mapping) -> Dict[Any, int]:
+            return {
+                key: bitmap_from_positions((live[row] for row in bitmap_positions(bitmap)), count)
+                for key, bitmap in bitmaps.items()
+            }
+        keep = ~bitmap_from_positions(dirty, base_count)
+        self.facets = FacetIndex(
+            count,
+            PatchedBitmapMap(base.facets.cuisines, at_positions(patched_facets.cuisines), keep),
+            PatchedBitmapMap(base.facets.price_levels, at_positions(patched_facets.price_levels), keep),
+            (base.facets.all & keep) | bitmap_from_positions(live, count),
+        )
 
-        # Load the cache
-        async with aiofiles.open('restaurant_cache.json', 'r') as f:
-            content = await f.read()
-            restaurants = json.loads(content)
+        # Scores of changed records use the base catalog's mean rating
+        self.rating_prior_mean = base.rating_prior_mean
+        scores, _ = bayesian_rating_scores(columns, base.rating_prior_mean)
+        self.scores = PatchedSequence(base.scores, dict(zip(live, scores)), count)
 
-        # Find the restaurant by `place_id`
-        restaurant = next(
-            (r for r in restaurants if r["additional_info"]["gmaps"]["place_id"] == place_id), None
+        # Added restaurants rank after every base restaurant, in the order they were added
+        added_ranks = {p: p for p in range(base_count, count)}
+        self.popularity = PatchedPopularityIndex(
+            base.popularity, PatchedSequence(base.popularity.rank, added_ranks, count), self.facets, live, dirty
+        )
+        self.score_popularity = PatchedPopularityIndex(
+            base.score_popularity, PatchedSequence(base.score_popularity.rank, added_ranks, count),
+            self.facets, live, dirty,
         )
 
-        if not restaurant:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Restaurant with place_id {place_id} not found"
-            )
+        patched_names = NameIndex.build(
+            columns.strings["gmaps_name"], columns.strings["yelp_name"],
+            [self.popularity.rank[p] for p in live],
+        )
+        names = {p: () for p, r in records.items() if r is None}
+        names.update(zip(live, patched_names.names))
+        self.names = PatchedNameIndex(
+            base.names, patched_names, live, set(records),
+            PatchedSequence(base.names.names, names, count), self.popularity.rank,
+        )
 
-        # Return the restaurant data exactly as it exists in the database
-        return restaurant
+    def materialize(self) -> List[dict]:
+        """The current records in catalog order, without removed ones, for a full rebuild."""
+        return [r for r in self.restaurants if r is not None]
 
+def patch_restaurant_catalog(catalog: RestaurantCatalog, changed: List[dict], removed_ids=()) -> RestaurantCatalog:
+    """
+    A new catalog with changed and removed restaurants (keyed by gmaps
+    place_id) layered over `catalog` without rebuilding its indexes.
+    Existing entries keep their position; new ones are appended.
+    """
+    if isinstance(catalog, PatchedRestaurantCatalog):
+        base, records = catalog.base, dict(catalog.records)
+    else:
+        base, records = catalog, {}
+    count = len(catalog)
+
+    # Positions given out in this batch, so repeated ids land on one position
+    positions: Dict[str, int] = {}
+    def position_of(place_id: Optional[str]) -> Optional[int]:
+        if not place_id:
+            return None
+        if place_id in positions:
+            return positions[place_id]
+        return catalog.by_place_id.get(place_id)
+
+    for restaurant in catalog.score_records(changed):
+        place_id = cached_restaurant_id(restaurant)
+        position = position_of(place_id)
+        if position is None:
+            position, count = count, count + 1
+        if place_id:
+            positions[place_id] = position
+        records[position] = restaurant
+    for place_id in removed_ids:
+        position = position_of(place_id)
+        if position is not None:
+            records[position] = None
+
+    return PatchedRestaurantCatalog(base, records, count, next_restaurant_catalog_version(), catalog.source_stat)
+
+_restaurant_catalog: Optional[RestaurantCatalog] = None
+_restaurant_catalog_version = 0
+_restaurant_catalog_swap_lock = threading.Lock()
+
+# Recently served catalogs by version, so paging cursors can keep reading
+# the catalog they started on after a swap
+CATALOG_CURSOR_KEEP = int(os.getenv("CATALOG_CURSOR_KEEP", "4"))
+_recent_restaurant_catalogs: Dict[int, RestaurantCatalog] = {}
+
+def next_restaurant_catalog_version() -> int:
+    global _restaurant_catalog_version
+    with _restaurant_catalog_swap_lock:
+        _restaurant_catalog_version += 1
+        return _restaurant_catalog_version
+
+def build_restaurant_catalog(restaurants: Sequence[dict], columns: Optional[CatalogColumns] = None,
+                             source_stat: Optional[tuple] = None,
+                             snapshot_version: Optional[int] = None,
+                             mapped: Optional[MappedCatalogFile] = None) -> RestaurantCatalog:
+    return RestaurantCatalog(
+        restaurants, next_restaurant_catalog_version(), columns, source_stat, snapshot_version, mapped
+    )
+
+def install_restaurant_catalog(catalog: RestaurantCatalog) -> RestaurantCatalog:
+    """
+    Make a built catalog the one served. Readers holding the previous
+    catalog are unaffected.
+    """
+    global _restaurant_catalog
+    with _restaurant_catalog_swap_lock:
+        _restaurant_catalog = catalog
+        _recent_restaurant_catalogs[catalog.version] = catalog
+        for version in sorted(_recent_restaurant_catalogs)[:-CATALOG_CURSOR_KEEP]:
+            del _recent_restaurant_catalogs[version]
+    return catalog
+
+def swap_restaurant_catalog(restaurants: Sequence[dict]) -> RestaurantCatalog:
+    """
+    Build a new catalog from a list of cached restaurants and make it the
+    one served. It keeps the catalog file identity of the catalog it
+    replaces, so workers do not reload a file older than their data. The new
+    catalog no longer matches a shared snapshot, so it has no snapshot_version.
+    """
+    current = _restaurant_catalog
+    source_stat = current.source_stat if current is not None else None
+    return install_restaurant_catalog(build_restaurant_catalog(restaurants, source_stat=source_stat))
+
+def publish_restaurant_catalog(restaurants: List[dict], snapshot_version: Optional[int]) -> RestaurantCatalog:
+    """
+    Build a catalog, write it as the shared catalog file for the given cache
+    snapshot, and serve it. Other workers map the file on their next check.
+    """
+    catalog = build_restaurant_catalog(restaurants, snapshot_version=snapshot_version)
+    catalog.source_stat = write_catalog_file(RESTAURANT_CATALOG_FILE, catalog, snapshot_version)
+    return install_restaurant_catalog(catalog)
+
+def load_mapped_restaurant_catalog() -> Optional[RestaurantCatalog]:
+    """
+    Build a catalog over the mapped catalog file, if there is one matching the
+    current restaurant cache snapshot. Records are decoded on access and the
+    indexes are served from the file as written by the publishing worker.
+    """
+    if not os.path.exists(RESTAURANT_CATALOG_FILE):
+        return None
+    mapped = MappedCatalogFile(RESTAURANT_CATALOG_FILE)
+    manifest = read_snapshot_manifest(RESTAURANT_CACHE_FILE)
+    if mapped.byteorder != sys.byteorder or mapped.snapshot_version != manifest["current"]:
+        return None
+    return build_restaurant_catalog(mapped.records(), source_stat=mapped.stat,
+                                    snapshot_version=mapped.snapshot_version, mapped=mapped)
+
+def load_restaurant_catalog_sync() -> Optional[RestaurantCatalog]:
+    catalog = None
+    try:
+        catalog = load_mapped_restaurant_catalog()
     except Exception as e:
+        print(f"Error mapping restaurant catalog file, falling back to JSON: {str(e)}")
+    if catalog is None:
+        restaurants, entry = read_cache_snapshot(RESTAURANT_CACHE_FILE)
+        if restaurants is None:
+            return None
+        catalog = build_restaurant_catalog(restaurants, snapshot_version=entry["version"] if entry else None)
+    return install_restaurant_catalog(catalog)
+
+async def load_restaurant_catalog() -> Optional[RestaurantCatalog]:
+    """
+    Load the restaurant cache into a new catalog, preferring the shared
+    mapped catalog file. Returns None if no cache has been written yet.
+    """
+    return await asyncio.to_thread(load_restaurant_catalog_sync)
+
+_restaurant_catalog_checked_at = 0.0
+
+async def get_restaurant_catalog() -> RestaurantCatalog:
+    """
+    Return the catalog currently being served, loading it from the cache
+    file on first use if the startup load found nothing.
+    Every CATALOG_RELOAD_INTERVAL seconds, checks whether another worker
+    published a new catalog file and maps it.
+    """
+    global _restaurant_catalog_checked_at
+    catalog = _restaurant_catalog
+    if catalog is not None and time.monotonic() - _restaurant_catalog_checked_at > CATALOG_RELOAD_INTERVAL:
+        _restaurant_catalog_checked_at = time.monotonic()
+        file_stat = catalog_file_stat(RESTAURANT_CATALOG_FILE)
+        if file_stat is not None and file_stat != catalog.source_stat:
+            try:
+                catalog = await asyncio.to_thread(load_mapped_restaurant_catalog) or catalog
+                if catalog is not _restaurant_catalog:
+                    install_restaurant_catalog(catalog)
+            except Exception as e:
+                print(f"Error reloading restaurant catalog file: {str(e)}")
+    if catalog is None:
+        catalog = await load_restaurant_catalog()
+    if catalog is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve restaurant: {str(e)}"
+            detail="Cache file not found. Please refresh the cache."
         )
+    return catalog
 
-# --- New Restaurant List Endpoints ---
+# --- Cursor pagination ---
+# Catalog cursors pin the cache snapshot version, which every worker serving
+# that snapshot shares. A catalog patched by live updates has no snapshot
+# version; its cursors carry the per-process catalog version and this
+# process's id instead, and are only honored by the worker that issued them.
+_catalog_cursor_instance = os.urandom(4).hex()
+RESTAURANT_PAGE_MAX = 1000
 
-#allLists endpoints
-@app.post("/allLists", status_code=status.HTTP_201_CREATED)
-async def create_global_restaurant_list(restaurant_list: RestaurantListBase):
+def encode_cursor(fields: dict) -> str:
+    raw = json.dumps(fields, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, required: Sequence[str] = ("o",)) -> dict:
+    """
+    Decode an opaque cursor and check it has the `required` keys.
+    An offset `o`, when present, must be a non-negative int.
+    """
     try:
-        # Verify the user exists before creating the list
-        user_doc = db.collection("users").document(restaurant_list.username).get()
-        if not user_doc.exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User '{restaurant_list.username}' not found"
-            )
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        decoded = json.loads(raw)
+        if not all(key in decoded for key in required):
+            raise ValueError("missing keys")
+        if "o" in decoded and (not isinstance(decoded["o"], int) or decoded["o"] < 0):
+            raise ValueError("bad offset")
+        return decoded
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
-        # Generate new document reference with auto-generated ID
-        list_ref = db.collection("allLists").document()
+def catalog_query_key(*params: Any) -> str:
+    # Ties a cursor to the filters it was issued for
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()[:12]
 
-        # Prepare list data with additional global list fields
-        list_data = {
-            **restaurant_list.dict(),
-            "id": list_ref.id,  # Use Firestore's auto-generated ID
+def find_snapshot_catalog(snapshot_version: int) -> Optional[RestaurantCatalog]:
+    """The current or a recently served catalog holding the given cache snapshot."""
+    candidates = [_restaurant_catalog, *reversed(list(_recent_restaurant_catalogs.values()))]
+    return next((c for c in candidates if c is not None and c.snapshot_version == snapshot_version), None)
+
+async def get_paging_catalog(limit: Optional[int], cursor: Optional[str], query_key: str) -> tuple:
+    """
+    Resolve the catalog and start offset for a paged request: the current
+    catalog for a first page, or the catalog version pinned by `cursor`.
+    Returns (catalog, offset).
+    """
+    global _restaurant_catalog_checked_at
+    if limit is not None and not 1 <= limit <= RESTAURANT_PAGE_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {RESTAURANT_PAGE_MAX}"
+        )
+    if not cursor:
+        return await get_restaurant_catalog(), 0
+
+    decoded = decode_cursor(cursor)
+    if decoded.get("q") != query_key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor does not match the requested filters"
+        )
+    catalog = None
+    if decoded.get("s") is not None:
+        catalog = find_snapshot_catalog(decoded["s"])
+        if catalog is None:
+            # Another worker may have published this snapshot since the last
+            # check for a new catalog file
+            _restaurant_catalog_checked_at = 0.0
+            await get_restaurant_catalog()
+            catalog = find_snapshot_catalog(decoded["s"])
+    elif decoded.get("i") == _catalog_cursor_instance:
+        catalog = _recent_restaurant_catalogs.get(decoded.get("v"))
+    if catalog is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Cursor expired: the restaurant cache has changed, start again without a cursor"
+        )
+    return catalog, decoded["o"]
+
+def catalog_page_end(limit: Optional[int], offset: int) -> int:
+    """Number of sorted result positions a page starting at `offset` needs."""
+    return offset + (limit or RESTAURANT_PAGE_MAX)
+
+def catalog_page(catalog: RestaurantCatalog, positions: List[int], query_key: str,
+                 limit: Optional[int], offset: int, total: Optional[int] = None) -> tuple:
+    """
+    Slice sorted result positions into a page. When `total`, the number of
+    results, is given, `positions` only needs to reach the end of the page.
+    Returns (page positions, next cursor or None).
+    """
+    end = catalog_page_end(limit, offset)
+    next_cursor = None
+    if end < (len(positions) if total is None else total):
+        if catalog.snapshot_version is not None:
+            pin = {"s": catalog.snapshot_version}
+        else:
+            pin = {"i": _catalog_cursor_instance, "v": catalog.version}
+        next_cursor = encode_cursor({**pin, "q": query_key, "o": end})
+    return positions[offset:end], next_cursor
+
+@app.on_event("startup")
+async def load_caches_on_startup():
+    try:
+        catalog = await load_restaurant_catalog()
+        if catalog is not None:
+            print(f"Restaurant catalog loaded: {len(catalog)} restaurants (version {catalog.version}).")
+    except Exception as e:
+        print(f"Error loading restaurant catalog: {str(e)}")
+
+    try:
+        store = await asyncio.to_thread(load_reviews_store)
+        print(f"Reviews store opened: {len(store)} restaurants.")
+    except Exception as e:
+        print(f"Error opening reviews store: {str(e)}")
+
+    # Optional live updates from Firestore, see start_cache_listeners
+    if os.getenv("CACHE_LISTENERS", "").lower() in ("1", "true", "yes"):
+        try:
+            start_cache_listeners()
+            print("Cache listeners started.")
+        except Exception as e:
+            print(f"Error starting cache listeners: {str(e)}")
+
+RESTAURANT_CACHE_STATE_FILE = 'restaurant_cache_state.json'
+_restaurant_refresh_lock = asyncio.Lock()
+
+def build_cached_restaurant(data: dict) -> dict:
+    """
+    Project a `restaurants` document onto the fields kept in the cache.
+    """
+    return {
+        "name": data.get("name", {}),
+        "ratings": data.get("ratings", {}),
+        "location": data.get("location", {}),
+        "price_level": data.get("price_level", {}),
+        "types": data.get("types", {}),
+        "additional_info": data.get("additional_info", {}),
+        "match_confidence": data.get("match_confidence", None),
+    }
+
+def cached_restaurant_id(restaurant: dict) -> Optional[str]:
+    return ((restaurant.get("additional_info") or {}).get("gmaps") or {}).get("place_id")
+
+def merge_restaurants(current: List[dict], changed: List[dict], removed_ids=()) -> List[dict]:
+    """
+    Apply changed and removed restaurants (keyed by gmaps place_id) to a cached
+    list. Existing entries keep their position; new ones are appended.
+    """
+    removed_ids = set(removed_ids)
+    merged = list(current)
+    positions = {cached_restaurant_id(r): i for i, r in enumerate(merged)}
+    for restaurant in changed:
+        place_id = cached_restaurant_id(restaurant)
+        if place_id in positions:
+            merged[positions[place_id]] = restaurant
+        else:
+            positions[place_id] = len(merged)
+            merged.append(restaurant)
+    if removed_ids:
+        merged = [r for r in merged if cached_restaurant_id(r) not in removed_ids]
+    return merged
+
+def encode_watermark(value: Any) -> Optional[dict]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return {"type": "timestamp", "value": value.isoformat()}
+    return {"type": "string", "value": str(value)}
+
+def decode_watermark(watermark: Optional[dict]) -> Any:
+    if not watermark:
+        return None
+    if watermark.get("type") == "timestamp":
+        return datetime.fromisoformat(watermark["value"])
+    return watermark["value"]
+
+def newer_watermark(current: Any, candidate: Any) -> Any:
+    if candidate is None:
+        return current
+    if current is None:
+        return candidate
+    try:
+        return candidate if candidate > current else current
+    except TypeError:
+        # Mixed string/timestamp values: prefer the timestamp
+        return candidate if isinstance(candidate, datetime) else current
+
+async def load_restaurant_cache_state() -> dict:
+    if not os.path.exists(RESTAURANT_CACHE_STATE_FILE):
+        return {}
+    async with aiofiles.open(RESTAURANT_CACHE_STATE_FILE, 'r') as f:
+        return json.loads(await f.read())
+
+async def save_restaurant_cache_state(watermark: Any, mode: str):
+    state = {
+        "watermark": encode_watermark(watermark),
+        "mode": mode,
+        "refreshed_at": datetime.utcnow().isoformat(),
+    }
+    await asyncio.to_thread(write_file_atomic, RESTAURANT_CACHE_STATE_FILE, json.dumps(state).encode())
+
+@app.post("/admin/refresh-restaurant-cache")
+async def refresh_restaurant_cache(background_tasks: BackgroundTasks, incremental: bool = False):
+    """
+    Rebuild the restaurant cache from Firestore in the background.
+    With `incremental=true`, only restaurants whose `updated_at` is newer than
+    the last refresh watermark are read and merged into the current catalog.
+    Falls back to a full refresh when there is no catalog or watermark yet.
+    Deleted restaurants are only dropped by a full refresh.
+    """
+
+    async def update_cache():
+        async with _restaurant_refresh_lock:
+            try:
+                state = await load_restaurant_cache_state()
+                watermark = decode_watermark(state.get("watermark"))
+                current = _restaurant_catalog or await load_restaurant_catalog()
+                mode = "incremental" if incremental and watermark is not None and current is not None else "full"
+
+                if mode == "incremental":
+                    restaurants_ref = await run_firestore(db.collection("restaurants").where("updated_at", ">", watermark).get)
+                else:
+                    restaurants_ref = await run_firestore(db.collection("restaurants").get)
+                    watermark = None
+
+                restaurant_list = []
+                for doc in restaurants_ref:
+                    data = doc.to_dict()
+
+                    # Collecting data for one restaurant
+                    restaurant_list.append(build_cached_restaurant(data))
+                    watermark = newer_watermark(watermark, data.get("updated_at"))
+
+                if mode == "incremental":
+                    if not restaurant_list:
+                        print("Cache is up to date.")
+                        return
+                    restaurant_list = merge_restaurants(current.restaurants, restaurant_list)
+
+                # Write the data to a new cache snapshot
+                snapshot = await asyncio.to_thread(write_cache_snapshot, RESTAURANT_CACHE_FILE, restaurant_list)
+
+                # Serve the new data and share it with the other workers
+                await asyncio.to_thread(publish_restaurant_catalog, restaurant_list, snapshot["version"])
+                await save_restaurant_cache_state(watermark, mode)
+
+                print(f"Cache updated successfully ({mode}, snapshot {snapshot['version']}).")
+
+            except Exception as e:
+                print(f"Error updating cache: {str(e)}")
+
+    # Run the update process in the background
+    background_tasks.add_task(update_cache)
+    return {"message": "Cache refresh started", "incremental": incremental}
+
+# --- Field projection ---
+@lru_cache(maxsize=256)
+def compile_projection(fields: Tuple[str, ...]) -> Callable[[dict], dict]:
+    """
+    Build an extractor that copies only the given dotted paths
+    (e.g. "name.gmaps") out of a restaurant record, keeping their nesting.
+    Compiled extractors are cached per field list.
+    """
+    paths = []
+    for field in fields:
+        path = tuple(field.split("."))
+        if not all(path):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid field: {field!r}"
+            )
+        paths.append(path)
+    # A path already covered by a shorter one would write into the record's
+    # own sub-dict, so drop it
+    paths = list(dict.fromkeys(paths))
+    paths = [p for p in paths if not any(p[:len(q)] == q for q in paths if len(q) < len(p))]
+
+    def project(record: dict) -> dict:
+        projected = {}
+        for path in paths:
+            value = record
+            for key in path:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                target = projected
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = value
+        return projected
+
+    return project
+
+# Named field sets for common views; usable alongside other fields
+FIELD_PRESETS = {
+    "pin": (
+        "additional_info.gmaps.place_id",
+        "name.gmaps",
+        "location.gmaps.lat",
+        "location.gmaps.lng",
+        "ratings.composite",
+    ),
+    "card": (
+        "additional_info.gmaps.place_id",
+        "additional_info.yelp.yelp_id",
+        "name",
+        "location.gmaps",
+        "ratings",
+        "price_level.composite",
+        "types",
+    ),
+}
+
+def parse_fields(fields: Optional[str]) -> Optional[Callable[[dict], dict]]:
+    """
+    Extractor for a comma-separated `fields` parameter of dotted paths and
+    preset names (`pin`, `card`), or None when all fields are wanted.
+    """
+    if not fields:
+        return None
+    names = []
+    for field in fields.split(","):
+        field = field.strip()
+        if field:
+            names.extend(FIELD_PRESETS.get(field, (field,)))
+    return compile_projection(tuple(names)) if names else None
+
+def project_restaurants(restaurants: List[dict], project: Optional[Callable[[dict], dict]]) -> List[dict]:
+    if project is None:
+        return restaurants
+    return [project(restaurant) for restaurant in restaurants]
+
+@app.get("/restaurants", response_model=Union[List[dict], Dict[str, Any]])
+async def get_restaurants(
+    search: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    price_level: Optional[int] = None,
+    include_facets: bool = False,
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Retrieve all restaurants from the cache and apply optional filters:
+    - `search`: Search by name (gmaps or yelp).
+    - `cuisine`: Filter by types (gmaps or yelp).
+    - `price_level`: Filter by price levels (composite).
+    - `include_facets`: Return `{"restaurants": [...], "facets": {...}}` with
+      result counts per cuisine and price level.
+    - `fields`: Comma-separated dotted paths or presets (`pin`, `card`) to return.
+    - `limit`, `cursor`: Page through the results; the response becomes
+      `{"restaurants": [...], "next_cursor": ...}`.
+    """
+    try:
+        project = parse_fields(fields)
+        paged = limit is not None or cursor is not None
+        query_key = catalog_query_key("restaurants", search, cuisine, price_level)
+        catalog, offset = await get_paging_catalog(limit, cursor, query_key)
+        restaurants = catalog.restaurants
+
+        # Filter by cuisine and price level
+        bitmap = catalog.facets.filter(cuisine, price_level)
+
+        # Filter by search
+        if search:
+            positions = sorted(filter(bitmap_contains(bitmap), catalog.names.substring_matches(search)))
+            bitmap = bitmap_from_positions(positions, len(catalog))
+        elif paged:
+            # Only decode the positions up to the end of the page
+            positions = bitmap_positions(bitmap, catalog_page_end(limit, offset))
+        else:
+            positions = bitmap_positions(bitmap)
+
+        response = {}
+        if paged:
+            positions, response["next_cursor"] = catalog_page(
+                catalog, positions, query_key, limit, offset, bitmap_count(bitmap)
+            )
+
+        # Return the filtered restaurants
+        results = project_restaurants([restaurants[i] for i in positions], project)
+        if include_facets:
+            response["facets"] = catalog.facets.counts(bitmap)
+        if response:
+            return {"restaurants": results, **response}
+        return results
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving restaurants: {str(e)}"
+        )
+
+# Fallback function for when cache fails
+async def get_restaurants_from_firestore():
+    restaurants = await run_firestore(db.collection("restaurants").get)
+    return [validate_and_serialize(doc.to_dict()) for doc in restaurants]
+
+@app.get("/restaurants/search", response_model=Union[List[dict], Dict[str, Any]])
+async def search_restaurants(
+    query: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    price_level: Optional[int] = None,
+    include_facets: bool = False,
+    sort: str = "relevance",
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Search for restaurants in the cache based on:
+    - `query`: Keywords in name (gmaps or yelp), results ranked by match quality.
+    - `cuisine`: Matches types in gmaps or yelp.
+    - `price_level`: Matches normalized price levels.
+    - `sort`: `relevance` (default) or `score` for the composite rating.
+    - `include_facets`: Return `{"restaurants": [...], "facets": {...}}` with
+      result counts per cuisine and price level.
+    - `fields`: Comma-separated dotted paths or presets (`pin`, `card`) to return.
+    - `limit`, `cursor`: Page through the results; the response becomes
+      `{"restaurants": [...], "next_cursor": ...}`.
+    """
+    try:
+        project = parse_fields(fields)
+        paged = limit is not None or cursor is not None
+        query_key = catalog_query_key("search", query, cuisine, price_level, sort)
+        catalog, offset = await get_paging_catalog(limit, cursor, query_key)
+        restaurants = catalog.restaurants
+
+        # Filter by cuisine and price level
+        bitmap = catalog.facets.filter(cuisine, price_level)
+
+        if sort not in ("relevance", "score"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="sort must be one of: relevance, score"
+            )
+        # Only the positions up to the end of the page are needed when paging
+        end = catalog_page_end(limit, offset) if paged else len(catalog)
+
+        # Filter by query in names, best matches first
+        if query:
+            positions = list(filter(bitmap_contains(bitmap), catalog.names.search(query)))
+            bitmap = bitmap_from_positions(positions, len(catalog))
+            if sort == "score":
+                positions = catalog.order_by_score(positions)
+        elif sort == "score":
+            # The score ranking is precomputed per cuisine and price level
+            positions = catalog.score_popularity.top(end, cuisine, price_level)
+        else:
+            positions = bitmap_positions(bitmap, end)
+
+        response = {}
+        if paged:
+            positions, response["next_cursor"] = catalog_page(
+                catalog, positions, query_key, limit, offset, bitmap_count(bitmap)
+            )
+
+        filtered_restaurants = project_restaurants([restaurants[i] for i in positions], project)
+        if include_facets:
+            response["facets"] = catalog.facets.counts(bitmap)
+        if response:
+            return {"restaurants": filtered_restaurants, **response}
+        return filtered_restaurants
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search restaurants: {str(e)}"
+        )
+
+@app.get("/restaurants/autocomplete", response_model=List[dict])
+async def autocomplete_restaurants(q: str, limit: int = 10):
+    """
+    Suggest restaurants whose gmaps or yelp name starts with the typed words,
+    most popular first.
+    """
+    try:
+        catalog = await get_restaurant_catalog()
+        suggestions = []
+        for i in catalog.names.autocomplete(q, limit):
+            r = catalog.restaurants[i]
+            suggestions.append({
+                "place_id": r["additional_info"]["gmaps"]["place_id"],
+                "name": r["name"]["gmaps"],
+                "address": r["location"]["gmaps"].get("address"),
+            })
+        return suggestions
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to autocomplete restaurants: {str(e)}"
+        )
+
+@app.get("/restaurants/popular", response_model=List[dict])
+async def get_popular_restaurants(
+    limit: int = 10,
+    cuisine: Optional[str] = None,
+    price_level: Optional[int] = None,
+    sort: str = "rating",
+):
+    """
+    Retrieve the most popular restaurants sorted by:
+    - Highest rating (`rating`).
+    - Most reviews (`user_ratings_total`) as a tiebreaker.
+    With `sort=score`, sorted by the composite gmaps + yelp score instead.
+    Optionally restricted to a `cuisine` and/or `price_level`.
+    """
+    try:
+        catalog = await get_restaurant_catalog()
+
+        # Rankings are precomputed when the catalog is built
+        return [
+            catalog.restaurants[i]
+            for i in catalog.ranking(sort).top(limit, cuisine, price_level)
+        ]
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve popular restaurants: {str(e)}"
+        )
+
+@app.get("/restaurants/nearby")
+async def get_nearby_restaurants(
+    lat: float,
+    lng: float,
+    radius_km: float = 2.0,
+    k: Optional[int] = None,
+    sort: str = "distance",
+    fields: Optional[str] = None,
+):
+    """
+    Retrieve restaurants within a given radius (in kilometers) of a specific location.
+    - `k`: Only return the k nearest restaurants within the radius.
+    - `sort`: `distance` (default) or `score` for the composite rating.
+    - `fields`: Comma-separated dotted paths or presets (`pin`, `card`) to return.
+    Results include `distance_km`.
+    """
+    try:
+        project = parse_fields(fields)
+        catalog = await get_restaurant_catalog()
+        if sort not in ("distance", "score"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="sort must be one of: distance, score"
+            )
+        if not all(isfinite(value) for value in (lat, lng, radius_km)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="lat, lng and radius_km must be finite numbers"
+            )
+
+        if k is not None:
+            matches = catalog.spatial.nearest(lat, lng, k, radius_km)
+        else:
+            matches = catalog.spatial.within(lat, lng, radius_km)
+
+        if sort == "score":
+            rank = catalog.score_popularity.rank
+            matches.sort(key=lambda match: rank[match[1]])
+
+        restaurants = project_restaurants([catalog.restaurants[position] for _, position in matches], project)
+        return [
+            {**restaurant, "distance_km": round(distance, 4)}
+            for restaurant, (distance, _) in zip(restaurants, matches)
+        ]
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve nearby restaurants: {str(e)}"
+        )
+
+RESTAURANT_BATCH_MAX = 500
+
+class RestaurantBatchRequest(BaseModel):
+    place_ids: List[str]
+
+@app.post("/restaurants/batch")
+async def get_restaurants_batch(
+    request: RestaurantBatchRequest,
+    fields: Optional[str] = None,
+    include_review_summary: bool = False,
+):
+    """
+    Retrieve many restaurants from the cache in one call.
+    - `place_ids`: Up to 500 Google place ids (Yelp ids are also accepted)
+    - `fields`: Comma-separated dotted paths or presets (`pin`, `card`) to return
+    - `include_review_summary`: Also return `review_summaries`, the review
+      count, mean rating and histogram keyed by Google place id
+    Restaurants are returned in request order; ids not in the cache are
+    listed in `missing`.
+    """
+    try:
+        if len(request.place_ids) > RESTAURANT_BATCH_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {RESTAURANT_BATCH_MAX} place_ids per request"
+            )
+        project = parse_fields(fields)
+        catalog = await get_restaurant_catalog()
+
+        restaurants, missing = catalog.get_many(request.place_ids)
+        response = {"restaurants": project_restaurants(restaurants, project), "missing": missing}
+        if include_review_summary:
+            place_ids = [place_id for place_id in map(cached_restaurant_id, restaurants) if place_id]
+            response["review_summaries"] = await asyncio.to_thread(
+                get_reviews_store().get_summaries, place_ids
+            )
+        return response
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve restaurants: {str(e)}"
+        )
+
+@app.get("/restaurants/{place_id}")
+async def get_restaurant(place_id: str):
+    """
+    Retrieve a single restaurant's full details from the cache by `place_id`.
+    """
+    try:
+        catalog = await get_restaurant_catalog()
+
+        # Find the restaurant by `place_id`
+        restaurant = catalog.get(place_id)
+
+        if not restaurant:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Restaurant with place_id {place_id} not found"
+            )
+
+        # Return the restaurant data exactly as it exists in the database
+        return restaurant
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve restaurant: {str(e)}"
+        )
+
+# --- New Restaurant List Endpoints ---
+
+#allLists endpoints
+@app.post("/allLists", status_code=status.HTTP_201_CREATED)
+async def create_global_restaurant_list(restaurant_list: RestaurantListBase):
+    try:
+        # Verify the user exists before creating the list
+        user_doc = await run_firestore(db.collection("users").document(restaurant_list.username).get)
+        if not user_doc.exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User '{restaurant_list.username}' not found"
+            )
+
+        # Generate new document reference with auto-generated ID
+        list_ref = db.collection("allLists").document()
+
+        # Prepare list data with additional global list fields
+        list_data = {
+            **restaurant_list.dict(),
+            "id": list_ref.id,  # Use Firestore's auto-generated ID
             "createdAt": datetime.utcnow().isoformat(),
             "num_likes": 0,
             "favorited_by": [],
         }
 
         # Set the document in allLists collection
-        list_ref.set(list_data)
+        await run_firestore(list_ref.set, list_data)
 
         return {
             "message": "Global restaurant list created successfully",
@@ -981,7 +3085,7 @@ async def get_all_restaurant_lists():
     try:
         # Retrieve all documents from the allLists collection
         lists_ref = db.collection("allLists")
-        lists = lists_ref.get()
+        lists = await run_firestore(lists_ref.get)
         
         # Convert Firestore documents to dictionaries and validate
         all_lists = [
@@ -1004,41 +3108,95 @@ async def get_all_restaurant_lists():
             detail=str(e)
         )
 
+LIST_SORT_FIELDS = ("createdAt", "num_likes", "name")
+
 @app.get("/allLists/paginated", response_model=Dict[str, Any])
 async def get_paginated_restaurant_lists(
-    page: int = 1, 
     page_size: int = 10,
     sort_by: str = 'createdAt',
-    order: str = 'desc'
+    order: str = 'desc',
+    cursor: Optional[str] = None,
+    page: Optional[int] = None,
 ):
+    """
+    Page through global lists.
+    - `sort_by`: createdAt (default), num_likes or name
+    - `order`: desc (default) or asc
+    - `cursor`: `next_cursor` from the previous page
+    - `page`: No longer supported past the first page; use `cursor`
+    """
     try:
+        if page is not None and page != 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="page is no longer supported; follow next_cursor with the cursor parameter"
+            )
+        if sort_by not in LIST_SORT_FIELDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"sort_by must be one of: {', '.join(LIST_SORT_FIELDS)}"
+            )
+        if order not in ("asc", "desc"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="order must be one of: asc, desc"
+            )
+        if not 1 <= page_size <= 100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="page_size must be between 1 and 100"
+            )
+
         lists_ref = db.collection("allLists")
-        
-        # Apply sorting
-        query = lists_ref.order_by(sort_by, direction=firestore.Query.DESCENDING)
-        
-        # Apply pagination
-        offset = (page - 1) * page_size
-        lists = query.limit(page_size).offset(offset).get()
-        
-        # Total count for pagination metadata
-        total_count = len(list(lists_ref.get()))
-        
+        direction = firestore.Query.DESCENDING if order == "desc" else firestore.Query.ASCENDING
+
+        # Apply sorting; the document id breaks ties so pages never overlap
+        query = lists_ref.order_by(sort_by, direction=direction).order_by("__name__", direction=direction)
+
+        # Continue after the last list of the previous page instead of
+        # skipping (and paying for) every earlier document
+        if cursor:
+            decoded = decode_cursor(cursor, required=("s", "d", "v", "id"))
+            if decoded["s"] != sort_by or decoded["d"] != order:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor does not match the requested sort_by and order"
+                )
+            last_value = decoded["v"]
+            if isinstance(last_value, dict):
+                last_value = decode_watermark(last_value)
+            query = query.start_after({sort_by: last_value, "__name__": decoded["id"]})
+
+        # Page and total count (counted server-side) are read concurrently
+        lists, count_result = await asyncio.gather(
+            run_firestore(query.limit(page_size).get),
+            run_firestore(lists_ref.count().get),
+        )
+        total_count = int(count_result[0][0].value)
+
         # Convert to list and validate
-        paginated_lists = [
-            validate_and_serialize(doc.to_dict()) 
-            for doc in lists 
-            if doc.exists
-        ]
-        
+        docs = [doc for doc in lists if doc.exists]
+        paginated_lists = [validate_and_serialize(doc.to_dict()) for doc in docs]
+
+        next_cursor = None
+        if len(docs) == page_size:
+            last_value = docs[-1].get(sort_by)
+            if isinstance(last_value, datetime):
+                last_value = encode_watermark(last_value)
+            next_cursor = encode_cursor({"s": sort_by, "d": order, "v": last_value, "id": docs[-1].id})
+
         return {
             "lists": paginated_lists,
-            "page": page,
             "page_size": page_size,
+            "sort_by": sort_by,
+            "order": order,
+            "next_cursor": next_cursor,
             "total_count": total_count,
-            "total_pages": math.ceil(total_count / page_size)
+            "total_pages": ceil(total_count / page_size)
         }
-    
+
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1065,7 +3223,7 @@ async def get_filtered_restaurant_lists(
         if color:
             query = query.where('color', '==', color)
         
-        lists = query.get()
+        lists = await run_firestore(query.get)
         
         filtered_lists = [
             validate_and_serialize(doc.to_dict()) 
@@ -1081,12 +3239,83 @@ async def get_filtered_restaurant_lists(
             detail=str(e)
         )
 
-@app.get("/allLists/{list_id}", response_model=RestaurantListRead)
-async def get_restaurant_list_by_id(list_id: str):
+GET_ALL_CHUNK = 300
+
+def fetch_docs(collection: str, doc_ids: List[str]) -> Dict[str, dict]:
+    """
+    Read documents of a collection by id with batched get_all calls.
+    Returns doc id -> document data for the ones that exist.
+    """
+    collection_ref = db.collection(collection)
+    docs = {}
+    for start in range(0, len(doc_ids), GET_ALL_CHUNK):
+        refs = [collection_ref.document(doc_id) for doc_id in doc_ids[start:start + GET_ALL_CHUNK]]
+        for doc in db.get_all(refs):
+            if doc.exists:
+                docs[doc.id] = doc.to_dict()
+    return docs
+
+# Firestore caps the number of values in an `in` filter
+FIRESTORE_IN_LIMIT = 30
+
+def query_restaurants_by_place_id(place_ids: List[str]) -> Dict[str, dict]:
+    """
+    Find `restaurants` documents by their `place_id` field, for documents
+    whose id is not the place_id. Returns place_id -> document data.
+    """
+    restaurants_ref = db.collection("restaurants")
+    docs = {}
+    for start in range(0, len(place_ids), FIRESTORE_IN_LIMIT):
+        chunk = place_ids[start:start + FIRESTORE_IN_LIMIT]
+        for doc in restaurants_ref.where("place_id", "in", chunk).stream():
+            data = doc.to_dict()
+            # Keep the first match per place_id, like the old limit(1) query
+            if data.get("place_id") not in docs:
+                data["id"] = doc.id
+                docs[data["place_id"]] = data
+    return docs
+
+async def hydrate_restaurants(place_ids: List[str]) -> tuple:
+    """
+    Resolve gmaps place_ids to restaurant records in the cache shape, from the
+    resident catalog when it is loaded and with one batched Firestore read for
+    the rest. Records read from Firestore get the composite score against the
+    catalog's mean rating; it is absent when no catalog is loaded.
+    Returns (restaurants in place_ids order, place_ids not found).
+    """
+    unique_ids = list(dict.fromkeys(place_ids))
+    found: Dict[str, dict] = {}
+    catalog = _restaurant_catalog
+    if catalog is not None:
+        # Only gmaps place_ids, which are also the Firestore document ids
+        for place_id in unique_ids:
+            i = catalog.by_place_id.get(place_id)
+            if i is not None:
+                found[place_id] = catalog.restaurants[i]
+    remaining = [place_id for place_id in unique_ids if place_id not in found]
+    if remaining:
+        docs = await run_firestore(fetch_docs, "restaurants", remaining)
+        fetched_ids = list(docs)
+        fetched = [build_cached_restaurant(docs[place_id]) for place_id in fetched_ids]
+        if catalog is not None:
+            fetched = catalog.score_records(fetched)
+        found.update(zip(fetched_ids, fetched))
+
+    restaurants = [found[place_id] for place_id in place_ids if place_id in found]
+    missing = [place_id for place_id in place_ids if place_id not in found]
+    return restaurants, missing
+
+@app.get("/allLists/{list_id}", response_model=RestaurantListDetail)
+async def get_restaurant_list_by_id(list_id: str, expand: bool = True):
+    """
+    Retrieve a global list.
+    - `expand`: Include the full restaurant records in `full_restaurants`
+      (default). Pass false when only the place_ids are needed.
+    """
     try:
         # Reference the specific document in allLists collection
         list_ref = db.collection("allLists").document(list_id)
-        list_doc = list_ref.get()
+        list_doc = await run_firestore(list_ref.get)
 
         # Check if the document exists
         if not list_doc.exists:
@@ -1096,30 +3325,18 @@ async def get_restaurant_list_by_id(list_id: str):
             )
 
         # Get the list data and validate
-        list_data = list_doc.to_dict()
-        
-        # Optional: Fetch full restaurant details
-        full_restaurants = []
-        for place_id in list_data.get('restaurants', []):
-            try:
-                # Fetch full restaurant details from restaurants collection
-                restaurant_ref = db.collection("restaurants").document(place_id)
-                restaurant_doc = restaurant_ref.get()
-                
-                if restaurant_doc.exists:
-                    full_restaurant = restaurant_doc.to_dict()
-                    full_restaurants.append(full_restaurant)
-            except Exception as e:
-                # Log the error but continue processing
-                print(f"Error fetching restaurant {place_id}: {e}")
+        list_data = validate_and_serialize(list_doc.to_dict())
+        if not expand:
+            return list_data
 
-        # Create a validated response
-        validated_list = validate_and_serialize({
-            **list_data,
-            'full_restaurants': full_restaurants  # Optional: include full restaurant details
-        })
+        # Fetch full restaurant details in one pass
+        full_restaurants, missing = await hydrate_restaurants(list_data.get('restaurants', []))
 
-        return validated_list
+        return {
+            **list_data,
+            'full_restaurants': full_restaurants,
+            'missing': missing,
+        }
 
     except HTTPException as he:
         raise he
@@ -1140,7 +3357,7 @@ async def like_restaurant_list(
     try:
         # Reference the specific list in `allLists`
         list_ref = db.collection("allLists").document(list_id)
-        list_doc = list_ref.get()
+        list_doc = await run_firestore(list_ref.get)
 
         if not list_doc.exists:
             raise HTTPException(
@@ -1164,14 +3381,14 @@ async def like_restaurant_list(
             num_likes = max(0, num_likes - 1)
 
             # Remove from the user's `lists` collection if unliked
-            liked_list_doc.delete()
+            await run_firestore(liked_list_doc.delete)
 
         elif not unlike and username not in favorited_by:
             favorited_by.append(username)
             num_likes += 1
 
             # Add to the user's `lists` collection if liked
-            liked_list_doc.set({
+            await run_firestore(liked_list_doc.set, {
                 "list_id": list_id,
                 "name": list_data.get("name", ""),
                 "description": list_data.get("description", ""),
@@ -1183,10 +3400,11 @@ async def like_restaurant_list(
             new_achievements = await check_and_award_achievements(username, "give_first_like")
 
         # Update the `allLists` document
-        list_ref.update({
+        await run_firestore(list_ref.update, {
             'favorited_by': favorited_by,
             'num_likes': num_likes
         })
+        invalidate_popular_lists()
 
         return {
             "message": "List liked/unliked successfully",
@@ -1213,30 +3431,96 @@ async def delete_restaurant_list(
     try:
         # Reference the specific list
         list_ref = db.collection("allLists").document(list_id)
-        list_doc = list_ref.get()
+        list_doc = await run_firestore(list_ref.get)
 
         if not list_doc.exists:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Restaurant list with ID '{list_id}' not found"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Restaurant list with ID '{list_id}' not found"
+            )
+
+        # Check if the user is the author
+        list_data = list_doc.to_dict()
+        if list_data.get('username') != username:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not authorized to delete this list"
+            )
+
+        # Delete from allLists and the user's personal lists
+        user_list_ref = db.collection("users").document(username).collection("lists").document(list_id)
+        await asyncio.gather(
+            run_firestore(list_ref.delete),
+            run_firestore(user_list_ref.delete),
+        )
+
+        return {"message": "List deleted successfully"}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+POPULAR_LIST_WINDOWS = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+}
+POPULAR_LISTS_TTL = float(os.getenv("POPULAR_LISTS_TTL", "30"))
+
+# (limit, window) -> (expires_at, lists). Cleared whenever a like changes a
+# count on this worker; other workers catch up within POPULAR_LISTS_TTL.
+_popular_lists_cache: Dict[tuple, tuple] = {}
+
+def invalidate_popular_lists():
+    _popular_lists_cache.clear()
+
+@app.get("/popularLists", response_model=List[RestaurantListRead])
+async def get_popular_restaurant_lists(limit: int = 5, window: Optional[str] = None):
+    """
+    Most liked global lists.
+    - `limit`: Number of lists to return (1-100, default 5)
+    - `window`: Only rank lists created in the last `day`, `week` or `month`
+    """
+    try:
+        if not 1 <= limit <= 100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="limit must be between 1 and 100"
             )
-
-        # Check if the user is the author
-        list_data = list_doc.to_dict()
-        if list_data.get('username') != username:
+        if window is not None and window not in POPULAR_LIST_WINDOWS:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not authorized to delete this list"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"window must be one of: {', '.join(POPULAR_LIST_WINDOWS)}"
             )
 
-        # Delete from allLists
-        list_ref.delete()
+        cache_key = (limit, window)
+        cached = _popular_lists_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
 
-        # Optional: Delete from user's personal lists
-        user_list_ref = db.collection("users").document(username).collection("lists").document(list_id)
-        user_list_ref.delete()
+        lists_ref = db.collection("allLists")
+        if window is None:
+            # Top lists straight from the num_likes index
+            lists = await run_firestore(lists_ref.order_by("num_likes", direction=firestore.Query.DESCENDING).limit(limit).get)
+            popular_lists = [validate_and_serialize(doc.to_dict()) for doc in lists if doc.exists]
+        else:
+            # Firestore can only order by the field of a range filter, so rank
+            # the lists created in the window here
+            cutoff = (datetime.utcnow() - POPULAR_LIST_WINDOWS[window]).isoformat()
+            lists = await run_firestore(lists_ref.where("createdAt", ">=", cutoff).get)
+            top_docs = heapq.nlargest(
+                limit,
+                (doc.to_dict() for doc in lists if doc.exists),
+                key=lambda x: x.get("num_likes", 0),
+            )
+            popular_lists = [validate_and_serialize(doc) for doc in top_docs]
 
-        return {"message": "List deleted successfully"}
+        _popular_lists_cache[cache_key] = (time.monotonic() + POPULAR_LISTS_TTL, popular_lists)
+        return popular_lists
 
     except HTTPException as he:
         raise he
@@ -1246,29 +3530,112 @@ async def delete_restaurant_list(
             detail=str(e)
         )
 
-@app.get("/popularLists", response_model=List[RestaurantListRead])
-async def get_popular_restaurant_lists():
+
+# --- Trending lists ---
+# Like events are counted per list in hourly buckets in `listLikeBuckets`
+# ({"hours": {"h2024010112": 3, ...}, "updated_at": ...}). Trending scores
+# decay exponentially with the age of each bucket and are materialized
+# periodically, so requests only slice a ready-made ranking.
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", "168"))
+TRENDING_REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_INTERVAL", "300"))
+TRENDING_SNAPSHOT_SIZE = 100
+
+_trending_snapshot: Optional[dict] = None
+_trending_refresh_lock = asyncio.Lock()
+
+def like_bucket_key(moment: datetime) -> str:
+    return moment.strftime("h%Y%m%d%H")
+
+def record_list_like_event(list_id: str, delta: int):
+    """
+    Count a like (+1) or unlike (-1) of a list in the current hour's bucket.
+    """
+    now = datetime.utcnow()
+    db.collection("listLikeBuckets").document(list_id).set({
+        "hours": {like_bucket_key(now): firestore.Increment(delta)},
+        "updated_at": now.isoformat(),
+    }, merge=True)
+
+def trending_score(hours: Dict[str, int], now: datetime) -> float:
+    decay = log(2) / TRENDING_HALF_LIFE_HOURS
+    current = datetime.strptime(like_bucket_key(now), "h%Y%m%d%H")
+    score = 0.0
+    for key, count in hours.items():
+        age_hours = (current - datetime.strptime(key, "h%Y%m%d%H")).total_seconds() / 3600
+        if age_hours < TRENDING_WINDOW_HOURS:
+            score += count * exp(-decay * age_hours)
+    return score
+
+def materialize_trending_lists() -> dict:
+    """
+    Score every list liked within the trending window, drop expired buckets,
+    and fetch the top lists.
+    """
+    now = datetime.utcnow()
+    window_start = now - timedelta(hours=TRENDING_WINDOW_HOURS)
+    oldest_key = like_bucket_key(window_start)
+
+    scores = []
+    buckets_ref = db.collection("listLikeBuckets")
+    for doc in buckets_ref.where("updated_at", ">=", window_start.isoformat()).stream():
+        hours = doc.to_dict().get("hours", {})
+        expired = [key for key in hours if key < oldest_key]
+        if expired:
+            doc.reference.update({f"hours.{key}": firestore.DELETE_FIELD for key in expired})
+        score = trending_score(hours, now)
+        if score > 0:
+            scores.append((score, doc.id))
+
+    top = heapq.nlargest(TRENDING_SNAPSHOT_SIZE, scores)
+    list_refs = [db.collection("allLists").document(list_id) for _, list_id in top]
+    list_docs = {doc.id: doc.to_dict() for doc in db.get_all(list_refs) if doc.exists}
+
+    trending = []
+    for score, list_id in top:
+        if list_id in list_docs:
+            trending.append({
+                **validate_and_serialize(list_docs[list_id]),
+                "trending_score": round(score, 4),
+            })
+    return {"computed_at": now.isoformat(), "lists": trending}
+
+async def get_trending_snapshot() -> dict:
+    """
+    Return the materialized trending ranking, recomputing it when it is
+    older than TRENDING_REFRESH_INTERVAL.
+    """
+    global _trending_snapshot
+    snapshot = _trending_snapshot
+    if snapshot is not None and time.monotonic() - snapshot["refreshed_at"] < TRENDING_REFRESH_INTERVAL:
+        return snapshot
+    async with _trending_refresh_lock:
+        # Another request may have refreshed it while we waited
+        if _trending_snapshot is not snapshot:
+            return _trending_snapshot
+        snapshot = await run_firestore(materialize_trending_lists)
+        snapshot["refreshed_at"] = time.monotonic()
+        _trending_snapshot = snapshot
+        return snapshot
+
+@app.get("/trendingLists", response_model=Dict[str, Any])
+async def get_trending_restaurant_lists(limit: int = 10):
+    """
+    Lists with the most recent likes, weighted by an exponential decay with
+    a half-life of TRENDING_HALF_LIFE_HOURS.
+    - `limit`: Number of lists to return (1-100, default 10)
+    """
     try:
-        # Retrieve all documents from the allLists collection
-        lists_ref = db.collection("allLists")
-        lists = lists_ref.get()
-        
-        # Convert Firestore documents to dictionaries and validate
-        all_lists = [
-            validate_and_serialize(doc.to_dict()) 
-            for doc in lists 
-            if doc.exists
-        ]
-        
-        # Sort by 'likes' in descending order and return the top 5
-        popular_lists = sorted(
-            all_lists, 
-            key=lambda x: x.get('likes', 0), 
-            reverse=True
-        )[:5]
-        
-        return popular_lists
-    
+        if not 1 <= limit <= TRENDING_SNAPSHOT_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"limit must be between 1 and {TRENDING_SNAPSHOT_SIZE}"
+            )
+        snapshot = await get_trending_snapshot()
+        return {"computed_at": snapshot["computed_at"], "lists": snapshot["lists"][:limit]}
+
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1289,7 +3656,7 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
     try:
         # Reference to the global list document
         list_ref = db.collection("allLists").document(list_id)
-        list_doc = list_ref.get()
+        list_doc = await run_firestore(list_ref.get)
         
         if not list_doc.exists:
             raise HTTPException(
@@ -1320,14 +3687,14 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
 
             # Remove from user's lists
             liked_list_ref = user_lists_ref.document(list_id)
-            liked_list_ref.delete()
+            await run_firestore(liked_list_ref.delete)
 
             # Update the author of the list
             author = list_data.get("author")
 
             author_lists_ref = db.collection("users").document(author).collection("lists")
             author_list_ref = author_lists_ref.document(list_id)
-            author_list_ref.set(list_data)  # Copy the data from allLists
+            await run_firestore(author_list_ref.set, list_data)  # Copy the data from allLists
         else:
             # Like
             list_data['favorited_by'].append(username)
@@ -1336,14 +3703,17 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
             # Add to user's lists with matching ID
             liked_list_ref = user_lists_ref.document(list_id)
 
-            liked_list_ref.set(list_data)
-
             # Update the author of the list
             author = list_data.get("author")
 
             author_lists_ref = db.collection("users").document(author).collection("lists")
             author_list_ref = author_lists_ref.document(list_id)
-            author_list_ref.set(list_data)  # Copy the data from allLists
+
+            # Both copies get the data from allLists
+            await asyncio.gather(
+                run_firestore(liked_list_ref.set, list_data),
+                run_firestore(author_list_ref.set, list_data),
+            )
 
             # Award achievement for giving the first like
             give_milestones = {
@@ -1353,9 +3723,12 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
                 30: "like_30_lists",
                 40: "like_40_lists"
             }
-            total_user_lists = len(list(user_lists_ref.stream()))
+            user_lists, user_doc = await asyncio.gather(
+                run_firestore(user_lists_ref.get),
+                run_firestore(db.collection("users").document(username).get),
+            )
+            total_user_lists = len(user_lists)
             
-            user_doc = db.collection("users").document(username).get()
             if not user_doc.exists:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -1382,7 +3755,7 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
         author_lists_ref = db.collection("users").document(author).collection("lists")
 
         total_likes_received = 0
-        for author_list_doc in author_lists_ref.stream():
+        for author_list_doc in await run_firestore(author_lists_ref.get):
             author_list_data = author_list_doc.to_dict()
             if author_list_data.get("author") == author:
                 total_likes_received += author_list_data.get("num_likes", 0)
@@ -1409,14 +3782,22 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
 
         print(new_achievements)
         # Update the global list document
-        list_ref.update({
+        await run_firestore(list_ref.update, {
             'favorited_by': list_data['favorited_by'],
             'num_likes': list_data['num_likes']
         })
+        invalidate_popular_lists()
+
+        liked = username in list_data['favorited_by']
+        try:
+            await run_firestore(record_list_like_event, list_id, 1 if liked else -1)
+        except Exception as e:
+            # Trending is best effort; the like itself has been saved
+            print(f"Error recording like event for list {list_id}: {str(e)}")
 
         return {
             "message": "List like toggled successfully",
-            "liked": username in list_data['favorited_by'],
+            "liked": liked,
             "num_likes": list_data['num_likes'],
             "newAchievements": new_achievements
         }
@@ -1436,7 +3817,7 @@ async def toggle_list_like(list_id: str, data: dict = Body(...)):
 async def create_restaurant_list(username: str, restaurant_list: RestaurantListBase):
     try:
         # Verify the user exists
-        user_doc = db.collection("users").document(username).get()
+        user_doc = await run_firestore(db.collection("users").document(username).get)
         if not user_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -1482,7 +3863,7 @@ async def create_restaurant_list(username: str, restaurant_list: RestaurantListB
         batch.update(user_ref, {"numOfLists": firestore.Increment(1)})
 
         # Commit the batch
-        batch.commit()
+        await run_firestore(batch.commit)
 
         new_achievements = []  # Initialize as a list
 
@@ -1545,34 +3926,30 @@ async def create_restaurant_list(username: str, restaurant_list: RestaurantListB
 @app.get("/users/{username}/lists", response_model=List[RestaurantListRead])
 async def get_user_restaurant_lists(username: str):
     try:
-        # Verify the user exists
-        user_doc = db.collection("users").document(username).get()
+        user_ref = db.collection("users").document(username)
+
+        def read_lists():
+            # Fetch user's lists, then the matching global lists by key
+            user_lists = [doc.to_dict() for doc in user_ref.collection("lists").get()]
+            list_ids = list(dict.fromkeys(data.get("id") for data in user_lists if data.get("id")))
+            return user_lists, fetch_docs("allLists", list_ids)
+
+        # The user check and the list reads are independent
+        user_doc, (user_lists, global_lists) = await asyncio.gather(
+            run_firestore(user_ref.get),
+            run_firestore(read_lists),
+        )
         if not user_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User '{username}' not found"
             )
 
-        # Fetch user's lists
-        user_lists = db.collection("users").document(username).collection("lists").get()
-
-        # Fetch corresponding global data from allLists
-        user_list_ids = [doc.id for doc in user_lists]
-        global_lists_ref = db.collection("allLists")
-        global_lists = [
-            doc.to_dict()
-            for doc in global_lists_ref.where("id", "in", user_list_ids).stream()
-        ]
-
         # Combine data to include global fields
-        combined_lists = []
-        for user_list_doc in user_lists:
-            user_list_data = user_list_doc.to_dict()
-            global_data = next(
-                (g for g in global_lists if g.get("id") == user_list_data.get("id")), {}
-            )
-            combined_data = {**user_list_data, **global_data}
-            combined_lists.append(validate_and_serialize(combined_data))
+        combined_lists = [
+            validate_and_serialize({**user_list_data, **global_lists.get(user_list_data.get("id"), {})})
+            for user_list_data in user_lists
+        ]
 
         return combined_lists
 
@@ -1588,14 +3965,14 @@ async def get_user_restaurant_lists(username: str):
 async def update_restaurant_list(username: str, list_id: str, restaurant_list: RestaurantListBase):
     try:
         list_ref = db.collection("users").document(username).collection("lists").document(list_id)
-        if not list_ref.get().exists:
+        if not (await run_firestore(list_ref.get)).exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Restaurant list not found"
             )
 
         # Update list
-        list_ref.update(restaurant_list.dict())
+        await run_firestore(list_ref.update, restaurant_list.dict())
         return {"message": "Restaurant list updated successfully"}
     except HTTPException as he:
         raise he
@@ -1614,7 +3991,7 @@ async def delete_restaurant_list(username: str, list_id: str):
         global_list_ref = db.collection("allLists").document(list_id)
 
         # Verify list exists and belongs to user
-        list_doc = list_ref.get()
+        list_doc = await run_firestore(list_ref.get)
         if not list_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -1636,7 +4013,7 @@ async def delete_restaurant_list(username: str, list_id: str):
         })
 
         # Commit the batch
-        batch.commit()
+        await run_firestore(batch.commit)
 
         return {"message": "Restaurant list deleted successfully"}
     except HTTPException as he:
@@ -1652,8 +4029,9 @@ async def delete_restaurant_list(username: str, list_id: str):
 async def get_restaurants_in_list(username: str, list_id: str):
     try:
         # Get the list
-        list_doc = db.collection("users").document(username)\
-                    .collection("lists").document(list_id).get()
+        list_doc = await run_firestore(
+            db.collection("users").document(username).collection("lists").document(list_id).get
+        )
         
         if not list_doc.exists:
             raise HTTPException(
@@ -1663,22 +4041,27 @@ async def get_restaurants_in_list(username: str, list_id: str):
         
         list_data = list_doc.to_dict()
         place_ids = list_data.get('restaurants', [])
-        
-        # Get all restaurants in the list using place_id
-        restaurants = []
-        restaurants_ref = db.collection("restaurants")
-        
-        for place_id in place_ids:
-            query = restaurants_ref.where("place_id", "==", place_id).limit(1)
-            docs = query.stream()
-            restaurant_doc = next(docs, None)
-            
-            if restaurant_doc:
-                restaurant_data = restaurant_doc.to_dict()
-                restaurant_data["id"] = restaurant_doc.id
-                restaurants.append(Restaurant(**restaurant_data))
-        
-        return restaurants   
+        unique_ids = list(dict.fromkeys(place_ids))
+
+        # Restaurants are keyed by place_id: read them in one batch. Only
+        # documents carrying the flat `place_id` field fit the Restaurant model.
+        restaurant_docs = {
+            place_id: {**data, "id": place_id}
+            for place_id, data in (await run_firestore(fetch_docs, "restaurants", unique_ids)).items()
+            if data.get("place_id") == place_id
+        }
+
+        # Older documents have auto ids; find those by their place_id field
+        remaining = [place_id for place_id in unique_ids if place_id not in restaurant_docs]
+        if remaining:
+            restaurant_docs.update(await run_firestore(query_restaurants_by_place_id, remaining))
+
+        # Build each model once, then lay them out in list order
+        models = {}
+        for place_id, restaurant_data in restaurant_docs.items():
+            models[place_id] = Restaurant(**restaurant_data)
+
+        return [models[place_id] for place_id in place_ids if place_id in models]
     
     except HTTPException as he:
         raise he
@@ -1774,79 +4157,595 @@ async def get_restaurant_photos(place_id: str, limit: int = 5):
         )
 
 #review endpoints:
+REVIEWS_CACHE_FILE = 'reviews_cache.json'
+_reviews_refresh_lock = asyncio.Lock()
+
+def build_cached_reviews(data: dict) -> dict:
+    """
+    Combine the Google and Yelp reviews of a `reviews` document into the
+    structure kept in the cache.
+    """
+    # Extract metadata
+    metadata = data["metadata"]
+
+    # Combine Google and Yelp reviews
+    reviews_list = []
+    reviews_list.extend(data.get("google_reviews", []))
+    reviews_list.extend(data.get("yelp_reviews", []))
+
+    return {
+        "google_place_id": metadata.get("google_place_id"),
+        "gmaps_name": metadata.get("gmaps_name"),
+        "yelp_name": metadata.get("yelp_name"),
+        "yelp_business_id": metadata.get("yelp_business_id"),
+        "fetch_time": metadata.get("fetch_time"),
+        "reviews": reviews_list
+    }
+
+def build_script_review(doc_id: str, data: dict) -> dict:
+    """
+    A single review document written by python_script/script.py (`restaurantId`,
+    `review`, `summary`, `stars`, ...) in the cached review shape. `review_id`
+    keeps the document id so listener updates can replace it.
+    """
+    stars = data.get("stars")
+    return {
+        "review_id": doc_id,
+        "text": data.get("review"),
+        "summary": data.get("summary"),
+        "time": None,
+        "rating": int(round(stars)) if isinstance(stars, (int, float)) else None,
+        "author": data.get("commentAuthor"),
+        "platform": data.get("source"),
+    }
+
+def empty_cached_reviews(place_id: str) -> dict:
+    # Entry for a restaurant that only has script.py reviews
+    return {
+        "google_place_id": place_id,
+        "gmaps_name": "",
+        "yelp_name": None,
+        "yelp_business_id": None,
+        "fetch_time": "",
+        "reviews": [],
+    }
+
+def attach_script_reviews(entry: dict, script_reviews: List[dict]) -> dict:
+    """
+    Replace the script.py reviews of a cached entry, keeping its Google and
+    Yelp reviews first and the script reviews in document id order.
+    """
+    reviews = [r for r in entry["reviews"] if not r.get("review_id")]
+    reviews.extend(sorted(script_reviews, key=lambda r: r["review_id"]))
+    return {**entry, "reviews": reviews}
+
+def build_reviews_data(docs) -> Dict[str, dict]:
+    """
+    Build the reviews cache from (doc_id, data) pairs of the `reviews`
+    collection: combined Google/Yelp documents carry `metadata`, script.py
+    documents are single reviews grouped by `restaurantId`. Documents that
+    fit neither, or fail to build, are skipped one at a time.
+    """
+    reviews_data = {}
+    script_reviews: Dict[str, List[dict]] = {}
+    for doc_id, data in docs:
+        try:
+            if data.get("metadata"):
+                restaurant_reviews = build_cached_reviews(data)
+                # Store using google_place_id as key
+                if restaurant_reviews["google_place_id"]:
+                    reviews_data[restaurant_reviews["google_place_id"]] = restaurant_reviews
+            elif data.get("restaurantId"):
+                script_reviews.setdefault(data["restaurantId"], []).append(build_script_review(doc_id, data))
+            else:
+                print(f"Skipping review document {doc_id}: no metadata or restaurantId")
+        except Exception as e:
+            print(f"Skipping review document {doc_id}: {str(e)}")
+
+    for place_id, reviews in script_reviews.items():
+        entry = reviews_data.get(place_id) or empty_cached_reviews(place_id)
+        reviews_data[place_id] = attach_script_reviews(entry, reviews)
+    return reviews_data
+
+REVIEWS_STORE_FILE = 'reviews_store.sqlite3'
+REVIEW_SORTS = ("newest", "rating")
+REVIEW_PLATFORMS = ("google", "yelp")
+
+def review_time_key(review: dict) -> str:
+    # Google times use "T", Yelp times a space; normalize so they sort together
+    return (review.get("time") or "").replace(" ", "T")
+
+def build_review_orders(reviews: List[dict]) -> Dict[str, Dict[str, List[int]]]:
+    """
+    Pre-sort a restaurant's reviews: for each sort, the review positions in
+    order, for all reviews and for each platform.
+    """
+    positions = range(len(reviews))
+    newest = sorted(positions, key=lambda i: review_time_key(reviews[i]), reverse=True)
+    # Stable sort on top of `newest`, so equal ratings stay newest first
+    by_rating = sorted(newest, key=lambda i: reviews[i].get("rating") or 0, reverse=True)
+    orders = {}
+    for sort, order in (("newest", newest), ("rating", by_rating)):
+        orders[sort] = {"all": order}
+        for platform in REVIEW_PLATFORMS:
+            orders[sort][platform] = [i for i in order if reviews[i].get("platform") == platform]
+    return orders
+
+def summarize_ratings(reviews: List[dict]) -> dict:
+    ratings = [r["rating"] for r in reviews if isinstance(r.get("rating"), (int, float))]
+    histogram = {str(star): 0 for star in range(1, 6)}
+    for rating in ratings:
+        star = str(min(max(int(round(rating)), 1), 5))
+        histogram[star] += 1
+    return {
+        "count": len(reviews),
+        "rated_count": len(ratings),
+        "mean": round(sum(ratings) / len(ratings), 4) if ratings else None,
+        "histogram": histogram,
+    }
+
+def build_review_summary(reviews: List[dict]) -> dict:
+    """
+    Review count, mean rating and star histogram, overall and per platform.
+    """
+    summary = summarize_ratings(reviews)
+    summary["platforms"] = {
+        platform: summarize_ratings([r for r in reviews if r.get("platform") == platform])
+        for platform in REVIEW_PLATFORMS
+    }
+    return summary
+
+def review_body(review: dict) -> str:
+    """
+    Searchable text of a review: its `text`, plus the `summary` that
+    python_script/script.py reviews may carry (see build_script_review).
+    """
+    parts = [review.get(field) for field in ("text", "summary")]
+    return "\n".join(part for part in parts if isinstance(part, str) and part)
+
+def build_review_match_query(query: str) -> str:
+    # Quote each term so user input never reaches the FTS5 query syntax;
+    # terms are ANDed together.
+    terms = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{term}"' for term in terms)
+
+def encode_review_cursor(content_hash: str, sort: str, platform: str, offset: int) -> str:
+    return encode_cursor({"h": content_hash[:16], "s": sort, "p": platform, "o": offset})
+
+class ReviewsStore:
+    """
+    Indexed on-disk reviews cache: one row per google_place_id holding that
+    restaurant's metadata and rating summary, plus one row per review and per
+    review position in each pre-sorted order, so a page reads only the reviews
+    it returns. Rows carry a content hash so a refresh only rewrites
+    restaurants whose reviews changed.
+
+    Review bodies are indexed in an FTS5 table kept in step with the rows,
+    so search is updated per restaurant rather than rebuilt.
+    """
+    # Bump when the table layout changes; the store is rebuilt from the
+    # reviews cache snapshot on the next start.
+    SCHEMA_VERSION = 4
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # Serializes writers; SQLite handles concurrent readers itself
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS restaurant_reviews")
+                conn.execute("DROP TABLE IF EXISTS review_items")
+                conn.execute("DROP TABLE IF EXISTS review_orders")
+                conn.execute("DROP TABLE IF EXISTS review_text")
+                conn.execute("DROP TABLE IF EXISTS review_text_rows")
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS restaurant_reviews (
+                    google_place_id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    meta TEXT NOT NULL,
+                    summary TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS review_items (
+                    google_place_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    review TEXT NOT NULL,
+                    PRIMARY KEY (google_place_id, position)
+                ) WITHOUT ROWID
+            """)
+            # Position of the review at each rank, per sort and platform ("all"
+            # for every platform), as built by build_review_orders
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS review_orders (
+                    google_place_id TEXT NOT NULL,
+                    sort TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    rank INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (google_place_id, sort, platform, rank)
+                ) WITHOUT ROWID
+            """)
+            # Full-text index of review bodies. `review_text_rows` maps each
+            # indexed rowid back to its restaurant and review, so one
+            # restaurant's entries can be replaced without scanning the index.
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS review_text
+                USING fts5(body, tokenize = 'unicode61 remove_diacritics 2')
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS review_text_rows (
+                    rowid INTEGER PRIMARY KEY,
+                    google_place_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    review TEXT NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS review_text_rows_place ON review_text_rows (google_place_id)"
+            )
+            conn.commit()
+
+    def _delete_reviews(self, conn: sqlite3.Connection, place_id: str):
+        conn.execute("DELETE FROM review_items WHERE google_place_id = ?", (place_id,))
+        conn.execute("DELETE FROM review_orders WHERE google_place_id = ?", (place_id,))
+        self._unindex_reviews(conn, place_id)
+
+    def _write_reviews(self, conn: sqlite3.Connection, place_id: str, reviews: List[dict]):
+        self._delete_reviews(conn, place_id)
+        conn.executemany(
+            "INSERT INTO review_items (google_place_id, position, review) VALUES (?, ?, ?)",
+            ((place_id, position, json.dumps(review)) for position, review in enumerate(reviews)),
+        )
+        conn.executemany(
+            "INSERT INTO review_orders (google_place_id, sort, platform, rank, position) VALUES (?, ?, ?, ?, ?)",
+            (
+                (place_id, sort, platform, rank, position)
+                for sort, platform_orders in build_review_orders(reviews).items()
+                for platform, order in platform_orders.items()
+                for rank, position in enumerate(order)
+            ),
+        )
+        self._index_reviews(conn, place_id, reviews)
+
+    def _unindex_reviews(self, conn: sqlite3.Connection, place_id: str):
+        conn.execute(
+            "DELETE FROM review_text WHERE rowid IN "
+            "(SELECT rowid FROM review_text_rows WHERE google_place_id = ?)",
+            (place_id,),
+        )
+        conn.execute("DELETE FROM review_text_rows WHERE google_place_id = ?", (place_id,))
+
+    def _index_reviews(self, conn: sqlite3.Connection, place_id: str, reviews: List[dict]):
+        for position, review in enumerate(reviews):
+            body = review_body(review)
+            if not body:
+                continue
+            # Everything but the text, so hits can be shown without the row
+            details = {k: v for k, v in review.items() if k not in ("text", "review")}
+            rowid = conn.execute(
+                "INSERT INTO review_text_rows (google_place_id, position, review) VALUES (?, ?, ?)",
+                (place_id, position, json.dumps(details)),
+            ).lastrowid
+            conn.execute("INSERT INTO review_text (rowid, body) VALUES (?, ?)", (rowid, body))
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM restaurant_reviews").fetchone()[0]
+
+    def get(self, place_id: str) -> Optional[dict]:
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT meta FROM restaurant_reviews WHERE google_place_id = ?", (place_id,)
+            ).fetchone()
+            if not row:
+                return None
+            entry = json.loads(row[0])
+            entry["reviews"] = [
+                json.loads(review) for (review,) in conn.execute(
+                    "SELECT review FROM review_items WHERE google_place_id = ? ORDER BY position", (place_id,)
+                )
+            ]
+            return entry
+        finally:
+            conn.commit()
+
+    def get_summary(self, place_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT summary FROM restaurant_reviews WHERE google_place_id = ?", (place_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_summaries(self, place_ids: List[str]) -> Dict[str, dict]:
+        summaries = {}
+        conn = self._connection()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(place_ids), 500):
+            chunk = place_ids[start:start + 500]
+            rows = conn.execute(
+                "SELECT google_place_id, summary FROM restaurant_reviews "
+                f"WHERE google_place_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            summaries.update((place_id, json.loads(summary)) for place_id, summary in rows)
+        return summaries
+
+    def search(self, query: str, place_id: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """
+        Reviews matching every term of `query`, best BM25 match first, each
+        with a highlighted snippet of the matching text.
+        """
+        match = build_review_match_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT r.google_place_id, r.position, r.review, "
+            "snippet(review_text, 0, '<b>', '</b>', '…', 16), bm25(review_text) "
+            "FROM review_text JOIN review_text_rows r ON r.rowid = review_text.rowid "
+            "WHERE review_text MATCH ?"
+        )
+        params: List[Any] = [match]
+        if place_id:
+            sql += " AND r.google_place_id = ?"
+            params.append(place_id)
+        sql += " ORDER BY bm25(review_text) LIMIT ?"
+        params.append(limit)
+
+        results = []
+        for google_place_id, position, review, snippet, rank in self._connection().execute(sql, params):
+            results.append({
+                "google_place_id": google_place_id,
+                "position": position,
+                "review": json.loads(review),
+                "snippet": snippet,
+                # bm25() is lower-is-better; flip it so higher scores rank first
+                "score": round(-rank, 4),
+            })
+        return results
+
+    def get_page(
+        self,
+        place_id: str,
+        sort: str = "newest",
+        platform: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Optional[dict]:
+        """
+        One page of a restaurant's reviews, read from its pre-sorted orders.
+        The cursor is tied to the row's content, so it expires when the
+        restaurant's reviews are refreshed.
+        """
+        conn = self._connection()
+        # One read transaction, so the page matches the row's content hash
+        conn.execute("BEGIN")
+        try:
+            return self._get_page(conn, place_id, sort, platform, limit, cursor)
+        finally:
+            conn.commit()
+
+    def _get_page(self, conn: sqlite3.Connection, place_id: str, sort: str, platform: Optional[str],
+                  limit: Optional[int], cursor: Optional[str]) -> Optional[dict]:
+        row = conn.execute(
+            "SELECT content_hash, meta FROM restaurant_reviews WHERE google_place_id = ?",
+            (place_id,),
+        ).fetchone()
+        if not row:
+            return None
+        content_hash, meta = row
+        platform_key = platform or "all"
+        offset = 0
+        if cursor:
+            decoded = decode_cursor(cursor)
+            if decoded.get("s") != sort or decoded.get("p") != platform_key:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor does not match the requested sort and platform"
+                )
+            if decoded.get("h") != content_hash[:16]:
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="Cursor expired: reviews have been refreshed, start again without a cursor"
+                )
+            offset = decoded["o"]
+
+        sql = (
+            "SELECT i.review FROM review_orders o JOIN review_items i "
+            "ON i.google_place_id = o.google_place_id AND i.position = o.position "
+            "WHERE o.google_place_id = ? AND o.sort = ? AND o.platform = ? AND o.rank >= ? "
+            "ORDER BY o.rank"
+        )
+        params: List[Any] = [place_id, sort, platform_key, offset]
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        reviews = [json.loads(review) for (review,) in conn.execute(sql, params)]
+        has_more = limit is not None and len(reviews) > limit
+
+        entry = json.loads(meta)
+        entry["reviews"] = reviews[:limit] if has_more else reviews
+        entry["next_cursor"] = (
+            encode_review_cursor(content_hash, sort, platform_key, offset + limit) if has_more else None
+        )
+        return entry
+
+    def upsert(self, entries: List[dict], conn: Optional[sqlite3.Connection] = None) -> List[str]:
+        """
+        Insert or replace restaurant review entries whose content changed.
+        Returns the place ids that were written.
+        """
+        own_transaction = conn is None
+        if own_transaction:
+            self._write_lock.acquire()
+            conn = self._connection()
+        try:
+            existing = dict(conn.execute("SELECT google_place_id, content_hash FROM restaurant_reviews"))
+            changed = []
+            for entry in entries:
+                place_id = entry.get("google_place_id")
+                if not place_id:
+                    continue
+                data = json.dumps(entry)
+                content_hash = hashlib.sha1(data.encode()).hexdigest()
+                if existing.get(place_id) == content_hash:
+                    continue
+                reviews = entry.get("reviews") or []
+                meta = {k: v for k, v in entry.items() if k != "reviews"}
+                conn.execute(
+                    "INSERT OR REPLACE INTO restaurant_reviews "
+                    "(google_place_id, content_hash, meta, summary) VALUES (?, ?, ?, ?)",
+                    (place_id, content_hash, json.dumps(meta), json.dumps(build_review_summary(reviews))),
+                )
+                self._write_reviews(conn, place_id, reviews)
+                existing[place_id] = content_hash
+                changed.append(place_id)
+            if own_transaction:
+                conn.commit()
+            return changed
+        except BaseException:
+            if own_transaction:
+                conn.rollback()
+            raise
+        finally:
+            if own_transaction:
+                self._write_lock.release()
+
+    def delete(self, place_ids: List[str], conn: Optional[sqlite3.Connection] = None) -> List[str]:
+        own_transaction = conn is None
+        if own_transaction:
+            self._write_lock.acquire()
+            conn = self._connection()
+        try:
+            removed = []
+            for place_id in place_ids:
+                if conn.execute("DELETE FROM restaurant_reviews WHERE google_place_id = ?", (place_id,)).rowcount:
+                    self._delete_reviews(conn, place_id)
+                    removed.append(place_id)
+            if own_transaction:
+                conn.commit()
+            return removed
+        except BaseException:
+            if own_transaction:
+                conn.rollback()
+            raise
+        finally:
+            if own_transaction:
+                self._write_lock.release()
+
+    def replace_all(self, reviews_data: Dict[str, dict]) -> tuple:
+        """
+        Make the store match a full reviews cache in one transaction.
+        Returns (changed place ids, removed place ids).
+        """
+        with self._write_lock:
+            conn = self._connection()
+            try:
+                stored_ids = [row[0] for row in conn.execute("SELECT google_place_id FROM restaurant_reviews")]
+                removed = self.delete([pid for pid in stored_ids if pid not in reviews_data], conn)
+                changed = self.upsert(list(reviews_data.values()), conn)
+                conn.commit()
+                return changed, removed
+            except BaseException:
+                conn.rollback()
+                raise
+
+_reviews_store: Optional[ReviewsStore] = None
+
+def get_reviews_store() -> ReviewsStore:
+    global _reviews_store
+    if _reviews_store is None:
+        _reviews_store = ReviewsStore(REVIEWS_STORE_FILE)
+    return _reviews_store
+
+def load_reviews_store() -> ReviewsStore:
+    """
+    Open the reviews store, seeding it from the current reviews cache
+    snapshot the first time it is created.
+    """
+    store = get_reviews_store()
+    if len(store) == 0:
+        reviews_data, _ = read_cache_snapshot(REVIEWS_CACHE_FILE)
+        if reviews_data:
+            store.replace_all(reviews_data)
+    return store
+
 @app.post("/admin/refresh-reviews-cache")
 async def refresh_reviews_cache(background_tasks: BackgroundTasks):
     async def update_reviews_cache():
-        try:
-            reviews_ref = db.collection("reviews").stream()
-            reviews_data = {}
-
-            for doc in reviews_ref:
-                # Get the document data
-                data = doc.to_dict()
-                
-                # Extract metadata
-                metadata = data["metadata"]
-                
-                # Combine Google and Yelp reviews
-                reviews_list = []
-                
-                # Add Google reviews
-                google_reviews = data.get("google_reviews", [])
-                reviews_list.extend(google_reviews)
-                
-                # Add Yelp reviews
-                yelp_reviews = data.get("yelp_reviews", [])
-                reviews_list.extend(yelp_reviews)
-                
-                # Create the structured data
-                restaurant_reviews = {
-                    "google_place_id": metadata.get("google_place_id"),
-                    "gmaps_name": metadata.get("gmaps_name"),
-                    "yelp_name": metadata.get("yelp_name"),
-                    "yelp_business_id": metadata.get("yelp_business_id"),
-                    "fetch_time": metadata.get("fetch_time"),
-                    "reviews": reviews_list
-                }
-                
-                # Store using google_place_id as key
-                if metadata.get("google_place_id"):
-                    reviews_data[metadata["google_place_id"]] = restaurant_reviews
+        async with _reviews_refresh_lock:
+            try:
+                reviews_ref = await run_firestore(db.collection("reviews").get)
+                reviews_data = build_reviews_data((doc.id, doc.to_dict()) for doc in reviews_ref)
 
-            # Write to cache file
-            async with aiofiles.open('reviews_cache.json', 'w') as f:
-                await f.write(json.dumps(reviews_data))
+                # Write to a new cache snapshot
+                snapshot = await asyncio.to_thread(write_cache_snapshot, REVIEWS_CACHE_FILE, reviews_data)
 
-            print("Reviews cache updated successfully.")
+                # Update the per-restaurant store that serves lookups
+                changed, removed = await asyncio.to_thread(get_reviews_store().replace_all, reviews_data)
 
-        except Exception as e:
-            print(f"Error updating reviews cache: {str(e)}")
+                print(
+                    f"Reviews cache updated successfully (snapshot {snapshot['version']}, "
+                    f"{len(changed)} changed, {len(removed)} removed)."
+                )
+
+            except Exception as e:
+                print(f"Error updating reviews cache: {str(e)}")
 
     # Run the update process in the background
     background_tasks.add_task(update_reviews_cache)
     return {"message": "Reviews cache refresh started"}
 
 @app.get("/restaurants/{place_id}/reviews", response_model=RestaurantReviews)
-async def get_restaurant_reviews(place_id: str):
+async def get_restaurant_reviews(
+    place_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    platform: Optional[str] = None,
+):
     """
-    Retrieve all reviews for a specific restaurant by its Google Place ID.
+    Retrieve reviews for a specific restaurant by its Google Place ID.
     The response includes both Google and Yelp reviews combined into a single list.
+    - `limit`: Page size; all matching reviews are returned when omitted
+    - `cursor`: `next_cursor` from the previous page
+    - `sort`: "newest" (default) or "rating"
+    - `platform`: Only return reviews from "google" or "yelp"
     """
     try:
-        # Ensure the cache file exists
-        if not os.path.exists('reviews_cache.json'):
+        if sort not in REVIEW_SORTS:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Reviews cache file not found. Please refresh the cache."
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"sort must be one of {', '.join(REVIEW_SORTS)}"
+            )
+        if platform is not None and platform not in REVIEW_PLATFORMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"platform must be one of {', '.join(REVIEW_PLATFORMS)}"
+            )
+        if limit is not None and limit < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="limit must be at least 1"
             )
-
-        # Load the cache
-        async with aiofiles.open('reviews_cache.json', 'r') as f:
-            content = await f.read()
-            reviews_data = json.loads(content)
 
         # Get reviews for the specific restaurant
-        restaurant_reviews = reviews_data.get(place_id)
+        restaurant_reviews = await asyncio.to_thread(
+            get_reviews_store().get_page, place_id, sort, platform, limit, cursor
+        )
         
         if not restaurant_reviews:
             raise HTTPException(
@@ -1856,13 +4755,307 @@ async def get_restaurant_reviews(place_id: str):
 
         return restaurant_reviews
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve reviews: {str(e)}"
         )
-    
 
+@app.get("/restaurants/{place_id}/reviews/summary", response_model=ReviewSummary)
+async def get_restaurant_review_summary(place_id: str):
+    """
+    Review count, mean rating and star histogram for a restaurant, overall
+    and per platform, without fetching the reviews themselves.
+    """
+    try:
+        summary = await asyncio.to_thread(get_reviews_store().get_summary, place_id)
+        if not summary:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Reviews not found for restaurant with place_id {place_id}"
+            )
+        return summary
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve review summary: {str(e)}"
+        )
+
+@app.get("/reviews/search", response_model=List[Dict[str, Any]])
+async def search_reviews(q: str, place_id: Optional[str] = None, limit: int = 20):
+    """
+    Full-text search over cached review text, ranked by BM25.
+    - `q`: Search terms; all terms must appear in the review
+    - `place_id`: Only search one restaurant's reviews
+    - `limit`: Maximum number of results (1-100)
+    """
+    try:
+        if not build_review_match_query(q):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="q must contain at least one search term"
+            )
+        if limit < 1 or limit > 100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="limit must be between 1 and 100"
+            )
+        return await asyncio.to_thread(get_reviews_store().search, q, place_id, limit)
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search reviews: {str(e)}"
+        )
+
+# --- Live cache updates ---
+# Firestore calls snapshot listeners from its own thread, so appliers take a
+# lock, build the new cache state off to the side and swap it in.
+# Restaurant changes are queued by the listener; changes arriving within
+# CACHE_LISTENER_DEBOUNCE seconds are coalesced by document and patched into
+# the catalog in one batch on the event loop, under the same lock as the cache
+# refresh. Patched catalogs are folded into a full rebuild, which refreshes
+# rankings and composite scores, at most every CATALOG_REBUILD_MIN_INTERVAL seconds.
+CACHE_LISTENER_DEBOUNCE = float(os.getenv("CACHE_LISTENER_DEBOUNCE", "1.0"))
+CATALOG_REBUILD_MIN_INTERVAL = float(os.getenv("CATALOG_REBUILD_MIN_INTERVAL", "60"))
+_cache_listener_lock = threading.Lock()
+_cache_listeners: Dict[str, Any] = {}
+_cache_listener_loop: Optional[asyncio.AbstractEventLoop] = None
+_pending_restaurant_changes: Dict[str, tuple] = {}
+_restaurant_catalog_rebuild: Optional[asyncio.Task] = None
+
+def apply_restaurant_changes(changes: List[tuple]):
+    """
+    Apply (change_type, doc_id, data) tuples from the `restaurants` collection
+    to the resident catalog as a patch over its indexes. change_type is ADDED,
+    MODIFIED or REMOVED. Callers hold _restaurant_refresh_lock.
+    """
+    catalog = _restaurant_catalog
+    changed, removed = [], []
+    for change_type, doc_id, data in changes:
+        if change_type == "REMOVED":
+            removed.append(cached_restaurant_id(build_cached_restaurant(data or {})) or doc_id)
+        else:
+            changed.append(build_cached_restaurant(data))
+    if not changed and not removed:
+        return
+    if catalog is None:
+        swap_restaurant_catalog(merge_restaurants([], changed, removed))
+    else:
+        install_restaurant_catalog(patch_restaurant_catalog(catalog, changed, removed))
+
+def queue_restaurant_changes(changes: List[tuple]):
+    """
+    Listener applier for `restaurants`: keep the latest change per document
+    and schedule a flush if none is pending.
+    """
+    with _cache_listener_lock:
+        was_empty = not _pending_restaurant_changes
+        for change in changes:
+            _pending_restaurant_changes[change[1]] = change
+        schedule = was_empty and bool(_pending_restaurant_changes)
+    if schedule:
+        asyncio.run_coroutine_threadsafe(flush_restaurant_changes(), _cache_listener_loop)
+
+async def flush_restaurant_changes():
+    global _restaurant_catalog_rebuild
+    await asyncio.sleep(CACHE_LISTENER_DEBOUNCE)
+    async with _restaurant_refresh_lock:
+        with _cache_listener_lock:
+            changes = list(_pending_restaurant_changes.values())
+            _pending_restaurant_changes.clear()
+        try:
+            await asyncio.to_thread(apply_restaurant_changes, changes)
+            print(f"Applied {len(changes)} restaurant changes.")
+        except Exception as e:
+            print(f"Error applying restaurant changes: {str(e)}")
+        if isinstance(_restaurant_catalog, PatchedRestaurantCatalog) and _restaurant_catalog_rebuild is None:
+            _restaurant_catalog_rebuild = asyncio.create_task(rebuild_patched_restaurant_catalog())
+
+async def rebuild_patched_restaurant_catalog():
+    """
+    Fold the live patches into a fully rebuilt catalog, which also brings the
+    rankings and composite scores of changed restaurants up to date. Runs
+    CATALOG_REBUILD_MIN_INTERVAL seconds after the first patch since the last
+    rebuild; patches arriving meanwhile are included.
+    """
+    global _restaurant_catalog_rebuild
+    await asyncio.sleep(CATALOG_REBUILD_MIN_INTERVAL)
+    async with _restaurant_refresh_lock:
+        try:
+            catalog = _restaurant_catalog
+            # A cache refresh may have replaced the patched catalog meanwhile
+            if isinstance(catalog, PatchedRestaurantCatalog):
+                await asyncio.to_thread(lambda: swap_restaurant_catalog(catalog.materialize()))
+                print(f"Rebuilt restaurant catalog: {len(_restaurant_catalog)} restaurants.")
+        except Exception as e:
+            print(f"Error rebuilding restaurant catalog: {str(e)}")
+        finally:
+            _restaurant_catalog_rebuild = None
+
+def apply_review_changes(changes: List[tuple]):
+    """
+    Apply (change_type, doc_id, data) tuples from the `reviews` collection
+    to the reviews store. Combined Google/Yelp documents replace a restaurant's
+    entry; script.py documents add, replace or remove one review in it.
+    """
+    with _cache_listener_lock:
+        store = get_reviews_store()
+        entries: Dict[str, dict] = {}
+
+        def entry_for(place_id: str) -> dict:
+            if place_id not in entries:
+                entries[place_id] = store.get(place_id) or empty_cached_reviews(place_id)
+            return entries[place_id]
+
+        for change_type, doc_id, data in changes:
+            data = data or {}
+            try:
+                if data.get("metadata"):
+                    place_id = data["metadata"].get("google_place_id")
+                    if not place_id:
+                        continue
+                    script_reviews = [r for r in entry_for(place_id)["reviews"] if r.get("review_id")]
+                    entry = empty_cached_reviews(place_id) if change_type == "REMOVED" else build_cached_reviews(data)
+                    entries[place_id] = attach_script_reviews(entry, script_reviews)
+                elif data.get("restaurantId"):
+                    entry = entry_for(data["restaurantId"])
+                    script_reviews = [
+                        r for r in entry["reviews"] if r.get("review_id") and r["review_id"] != doc_id
+                    ]
+                    if change_type != "REMOVED":
+                        script_reviews.append(build_script_review(doc_id, data))
+                    entries[data["restaurantId"]] = attach_script_reviews(entry, script_reviews)
+                else:
+                    print(f"Skipping review document {doc_id}: no metadata or restaurantId")
+            except Exception as e:
+                print(f"Skipping review document {doc_id}: {str(e)}")
+
+        # Entries left with no reviews and no Google/Yelp metadata are dropped
+        removed = [
+            place_id for place_id, entry in entries.items()
+            if not entry["reviews"] and not entry["gmaps_name"] and not entry["fetch_time"]
+        ]
+        store.delete(removed)
+        store.upsert([entry for place_id, entry in entries.items() if place_id not in removed])
+
+def snapshot_listener(apply_changes):
+    """
+    Adapt an apply_*_changes function to Firestore's on_snapshot callback.
+    """
+    def on_snapshot(col_snapshot, changes, read_time):
+        try:
+            apply_changes([
+                (change.type.name, change.document.id, change.document.to_dict())
+                for change in changes
+            ])
+        except Exception as e:
+            print(f"Error applying cache changes: {str(e)}")
+    return on_snapshot
+
+def start_cache_listeners(listen=None):
+    """
+    Attach snapshot listeners to `restaurants` and `reviews`. Must be called
+    from the event loop, which runs the queued restaurant updates.
+    `listen(collection_name, callback)` defaults to Firestore's on_snapshot
+    and can be replaced by a local fake that feeds change tuples.
+    """
+    global _cache_listener_loop
+    if listen is None:
+        listen = lambda name, callback: db.collection(name).on_snapshot(callback)
+    _cache_listener_loop = asyncio.get_running_loop()
+    with _cache_listener_lock:
+        if "restaurants" not in _cache_listeners:
+            _cache_listeners["restaurants"] = listen("restaurants", snapshot_listener(queue_restaurant_changes))
+        if "reviews" not in _cache_listeners:
+            _cache_listeners["reviews"] = listen("reviews", snapshot_listener(apply_review_changes))
+
+def stop_cache_listeners():
+    with _cache_listener_lock:
+        for watch in _cache_listeners.values():
+            if hasattr(watch, "unsubscribe"):
+                watch.unsubscribe()
+        _cache_listeners.clear()
+
+@app.post("/admin/cache-listeners/start")
+async def start_cache_listeners_endpoint():
+    try:
+        start_cache_listeners()
+        return {"message": "Cache listeners started", "collections": sorted(_cache_listeners)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to start cache listeners: {str(e)}"
+        )
+
+@app.post("/admin/cache-listeners/stop")
+async def stop_cache_listeners_endpoint():
+    stop_cache_listeners()
+    return {"message": "Cache listeners stopped"}
+
+@app.on_event("shutdown")
+async def stop_cache_listeners_on_shutdown():
+    stop_cache_listeners()
+
+# --- Cache snapshot admin ---
+SNAPSHOT_CACHE_FILES = {
+    "restaurants": RESTAURANT_CACHE_FILE,
+    "reviews": REVIEWS_CACHE_FILE,
+}
+
+def snapshot_cache_file(cache: str) -> str:
+    if cache not in SNAPSHOT_CACHE_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown cache '{cache}'"
+        )
+    return SNAPSHOT_CACHE_FILES[cache]
+
+@app.get("/admin/cache-snapshots/{cache}")
+async def list_cache_snapshots(cache: str):
+    try:
+        return await asyncio.to_thread(read_snapshot_manifest, snapshot_cache_file(cache))
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read cache snapshots: {str(e)}"
+        )
+
+@app.post("/admin/cache-snapshots/{cache}/rollback")
+async def rollback_cache(cache: str, version: int):
+    """
+    Serve a previous snapshot version of the restaurants or reviews cache.
+    """
+    try:
+        cache_file = snapshot_cache_file(cache)
+        # Serialized with the refresh of the same cache, so a refresh cannot
+        # publish between the rollback and serving the rolled back data
+        refresh_lock = _restaurant_refresh_lock if cache == "restaurants" else _reviews_refresh_lock
+        async with refresh_lock:
+            payload, entry = await asyncio.to_thread(rollback_cache_snapshot, cache_file, version)
+            if cache == "restaurants":
+                await asyncio.to_thread(publish_restaurant_catalog, payload, entry["version"])
+                # The refresh watermark no longer matches the data being served
+                await save_restaurant_cache_state(None, "rollback")
+            else:
+                await asyncio.to_thread(get_reviews_store().replace_all, payload)
+        return {"message": f"Rolled back {cache} cache", "snapshot": entry}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to roll back cache: {str(e)}"
+        )
 
 @app.get("/users/{username}/achievements", response_model=List[dict])
 async def get_user_achievements(username: str):
@@ -1872,7 +5065,7 @@ async def get_user_achievements(username: str):
     try:
         # Reference the user document
         user_ref = db.collection("users").document(username)
-        user_doc = user_ref.get()
+        user_doc = await run_firestore(user_ref.get)
 
         # Check if user exists
         if not user_doc.exists:
@@ -1885,17 +5078,13 @@ async def get_user_achievements(username: str):
         user_data = user_doc.to_dict()
         achievements = user_data.get("achievements", [])
 
-        # Fetch achievement details from the achievements collection
-        achievements_ref = db.collection("achievements")
-        achievement_details = []
-
-        for achievement_id in achievements:
-            achievement_doc = achievements_ref.document(achievement_id).get()
-            if achievement_doc.exists:
-                achievement_details.append({
-                    "id": achievement_id,
-                    **achievement_doc.to_dict()
-                })
+        # Fetch achievement details from the achievements collection in one batch
+        achievement_docs = await run_firestore(fetch_docs, "achievements", list(dict.fromkeys(achievements)))
+        achievement_details = [
+            {"id": achievement_id, **achievement_docs[achievement_id]}
+            for achievement_id in achievements
+            if achievement_id in achievement_docs
+        ]
 
         return achievement_details
 
@@ -1912,7 +5101,7 @@ async def get_all_achievements():
     Retrieve all achievements from the achievements collection.
     """
     try:
-        achievements_ref = db.collection("achievements").stream()
+        achievements_ref = await run_firestore(db.collection("achievements").get)
         achievements = []
 
         for doc in achievements_ref:
@@ -1946,7 +5135,7 @@ async def add_achievement(achievement: Achievement):
         doc_id = achievement_data.pop("id")  # Extract the id and remove it from the document data
 
         # Use doc_id as the document ID and add the rest of the data
-        db.collection("achievements").document(doc_id).set(achievement_data)
+        await run_firestore(db.collection("achievements").document(doc_id).set, achievement_data)
 
         return {"message": f"Achievement '{doc_id}' added successfully."}
 
@@ -1958,18 +5147,19 @@ async def add_achievement(achievement: Achievement):
 
 
 async def check_and_award_achievements(username: str, achievement_id: str):
-    # Fetch user document
+    # Fetch the user document and the achievement document by its ID
     user_ref = db.collection("users").document(username)
-    user_doc = user_ref.get()
+    achievement_ref = db.collection("achievements").document(achievement_id)
+    user_doc, achievement_doc = await asyncio.gather(
+        run_firestore(user_ref.get),
+        run_firestore(achievement_ref.get),
+    )
     if not user_doc.exists:
         raise HTTPException(status_code=404, detail=f"User {username} not found")
 
     user_data = user_doc.to_dict()
     current_achievements = set(user_data.get("achievements", []))
 
-    # Fetch the achievement document by its ID
-    achievement_ref = db.collection("achievements").document(achievement_id)
-    achievement_doc = achievement_ref.get()
     if not achievement_doc.exists:
         raise HTTPException(status_code=404, detail=f"Achievement '{achievement_id}' not found")
 
@@ -1981,7 +5171,7 @@ async def check_and_award_achievements(username: str, achievement_id: str):
 
     # Add the achievement and update points
     current_achievements.add(achievement_id)
-    user_ref.update({
+    await run_firestore(user_ref.update, {
         "achievements": list(current_achievements),
         "points.generalPoints": firestore.Increment(achievement["points"])
     })